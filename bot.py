@@ -4,8 +4,13 @@ config = ConfigParser()
 config.read(sys.argv[1])
 
 import io
+import json
+import asyncio
+import hashlib
+import datetime
 import textwrap
 import contextlib
+from collections import Counter
 
 from typing import Optional, Literal, Coroutine
 
@@ -15,13 +20,20 @@ from discord import app_commands
 
 # project imports
 import db
-from db import Twow, TwowState, TwowChannel
+import pool
+import presets
+import registry
+import transfer
+from db import Twow, TwowState, TwowChannel, Transition
 
-from utils.views import EmptyView
+from utils.views import PageView, Router, disable_message, reply
+from utils.scheduler import Scheduler
+from utils.compaction import Compactor, purge
+from utils.render import RenderCache
+from registry import StaleState
 
-# twow game imports
-import importlib
-game = importlib.import_module(config['game']['preset'])
+# twow game presets (each is imported the first time a channel needs it)
+games = presets.PresetRegistry(default=config['game']['preset'])
 
 # logging setup
 import logging
@@ -31,13 +43,7 @@ logger = logging.getLogger(config['game']['preset'])
 logger.setLevel(logging.DEBUG)  # TODO: Change back to logging.INFO
 
 
-state_view_map = {
-    TwowState.REGISTERING: game.signup.SignUpView,
-    TwowState.RESPONDING: game.prompt.SubmissionView,
-    TwowState.VOTING: game.vote.VotingView,
-    TwowState.IDLE: EmptyView,
-    TwowState.HIBERNATING: game.hibernate.HibernationView,
-}
+TREE_FINGERPRINT_FILE = '.command_tree_fingerprint'
 
 
 class TwowClient(discord.Client):
@@ -46,35 +52,141 @@ class TwowClient(discord.Client):
         super().__init__(intents=intents, **kwargs)
         self.tree = app_commands.CommandTree(self)
 
-        self.twows: dict[int, Twow] = {}
+        self.scheduler: Scheduler = None
+        self.compactor: Compactor = None
+        self.hosts: dict[int, int] = {}  # channel id -> host role id
+        self.host_roles: Counter = Counter()  # host role id -> number of channels it hosts
+        self.router = Router()
+        self._background_tasks: set[asyncio.Task] = set()
+
+    def background(self, coro: Coroutine):
+        """
+        Run a coroutine as a background task, keeping a reference until it finishes.
+        """
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
 
     async def setup_hook(self):
         """
         Database setup & other stuff.
         """
+        games.on_load(self.register_preset)
         await db.init()
+        await pool.backfill(legacy_guild_id=int(config['test server']['id']))
+        await self.recover_transitions()
 
         async with db.session() as session:
-            stmt = db.select(TwowChannel)
+            stmt = db.select(TwowChannel).where(TwowChannel.deleted.is_(False))
             result = await session.scalars(stmt)
             channels: list[TwowChannel] = result.all()
 
-            stmt = db.select(Twow)
+            stmt = db.select(Twow).join(TwowChannel, TwowChannel.current_twow_id == Twow.id).where(TwowChannel.deleted.is_(False))
             result = await session.scalars(stmt)
             twows: list[Twow] = result.all()
 
         for channel in channels:
-            self.twows[channel.id] = Twow(state=TwowState.HIBERNATING)
+            games.assign(channel.id, channel.preset)
+            self.set_host(channel.id, channel.host_id)
+            registry.twows.publish(channel.id, Twow(channel_id=channel.id, state=TwowState.HIBERNATING))
+
+        for twow in twows:
+            registry.twows.publish(twow.channel_id, twow)
 
-        twows = [twow for twow in twows if any(channel.current_twow_id == twow.id for channel in channels)]
+        # deadlines of running TWOWs (overdue ones fire as soon as the client is ready)
+        self.scheduler = Scheduler(on_deadline)
         for twow in twows:
-            self.twows[twow.channel_id] = twow
-            view_cls = state_view_map[twow.state]
-            self.add_view(view_cls(twow), message_id=twow.current_message_id)
+            if twow.deadline:
+                self.scheduler.schedule(twow.channel_id, twow.deadline.replace(tzinfo=datetime.timezone.utc).timestamp())
+        self.scheduler.start()
+
+        # soft-deleted rows are purged in the background rather than in interactions
+        self.compactor = Compactor(self.compaction_jobs)
+        self.compactor.start()
 
         MY_GUILD = discord.Object(id=int(config['test server']['id']))
         self.tree.copy_global_to(guild=MY_GUILD)
-        await self.tree.sync(guild=MY_GUILD)
+        await self.sync_tree(MY_GUILD)
+
+    def register_preset(self, preset: presets.Preset):
+        """
+        Register the persistent views of a preset once it is loaded: one view per state, regardless of how many TWOWs are running.
+        """
+        for view_cls in set(preset.views.values()):
+            self.router.register(view_cls(), namespace=preset.name)
+        import_times = getattr(preset.module, 'import_times', {})
+        if import_times:
+            logger.info(f'Preset {preset.name} imports: ' + ', '.join(f'{name} {1000 * seconds:.0f} ms' for name, seconds in import_times.items()))
+
+    async def sync_tree(self, guild: discord.abc.Snowflake, force: bool = False):
+        """
+        Sync the command tree to a guild, unless its commands are unchanged since the last sync.
+        """
+        payload = [command.to_dict() for command in self.tree.get_commands(guild=guild)]
+        fingerprint = hashlib.sha256(json.dumps(
+            dict(application_id=self.application_id, guild_id=guild.id, commands=payload), sort_keys=True
+        ).encode()).hexdigest()
+
+        try:
+            with open(TREE_FINGERPRINT_FILE) as file:
+                synced = file.read().strip() == fingerprint
+        except FileNotFoundError:
+            synced = False
+        if synced and not force:
+            logger.info(f'Command tree unchanged ({len(payload)} commands), skipping sync.')
+            return False
+
+        await self.tree.sync(guild=guild)
+        with open(TREE_FINGERPRINT_FILE, 'w') as file:
+            file.write(fingerprint)
+        logger.info(f'Synced {len(payload)} commands to guild {guild.id}.')
+        return True
+
+    async def recover_transitions(self):
+        """
+        Roll back transitions that were interrupted before being applied. (Only new TWOWs reserved by /signup can be left behind.)
+        """
+        async with db.session() as session, session.begin():
+            stmt = db.select(Transition).where(Transition.completed.is_(False))
+            pending: list[Transition] = (await session.scalars(stmt)).all()
+            for transition in pending:
+                stmt = db.delete(Twow).where(Twow.id == transition.twow_id, Twow.state.is_(None))
+                await session.execute(stmt)
+                transition.completed = True
+                logger.warning(f'Rolled back interrupted {transition}.')
+
+    def set_host(self, channel_id: int, role_id: Optional[int]):
+        """
+        Track the host role of an active channel (None once deactivated), so /help needs no database lookup.
+        """
+        old = self.hosts.pop(channel_id, None)
+        if old is not None:
+            self.host_roles[old] -= 1
+            if not self.host_roles[old]:
+                del self.host_roles[old]
+        if role_id is not None:
+            self.hosts[channel_id] = role_id
+            self.host_roles[role_id] += 1
+
+    def compaction_jobs(self):
+        async def channels():
+            return {TwowChannel.__tablename__: await purge(TwowChannel)}
+        return [channels] + [preset.tables.compact for preset in games.loaded() if hasattr(preset.tables, 'compact')]
+
+    async def close(self):
+        if self.compactor:
+            self.compactor.stop()
+        for preset in games.loaded():
+            if hasattr(preset.module, 'close'):
+                await preset.close()
+        await super().close()
+
+    async def on_interaction(self, interaction: discord.Interaction):
+        if interaction.type != discord.InteractionType.component or interaction.channel_id not in registry.twows:
+            return
+        preset = await games.for_channel(interaction.channel_id)  # loads the preset (and registers its views) on first use
+        await self.router.dispatch(interaction, namespace=preset.name)
 
     async def on_ready(self):
         await self.change_presence(
@@ -85,11 +197,12 @@ class TwowClient(discord.Client):
             )
         )
 
-        logger.info(f'Connected! {len(self.twows)} TWOW(s) across {len(self.guilds)} server(s).')
-        for channel, twow in self.twows.items():
+        logger.info(f'Connected! {len(registry.twows)} TWOW(s) across {len(self.guilds)} server(s).')
+        for channel, twow in registry.twows.items():
             logger.debug(f'{channel} {twow.state}')
 
         self.cmds = {ac.name: ac for ac in await self.tree.fetch_commands()}
+        renders.clear()  # cached embeds mention commands by id
         logger.info(f'This client has {len(self.cmds)} global commands.')
 
 intents = discord.Intents.none()
@@ -104,49 +217,45 @@ def info_chip(interaction: discord.Interaction):
 
 def format_cmd(name: str):
     """
-    Mentions command of a particular name.
+    Mentions command of a particular name. (Subcommands are mentioned by their qualified name, e.g. `prompts search`.)
     """
-    cmd = client.cmds[name]
-    return f'</{cmd.name}:{cmd.id}>'
+    cmd = client.cmds[name.split()[0]]
+    return f'</{name}:{cmd.id}>'
+
+
+ABOUT = 'I am an [open source](https://github.com/ilikecubesnstuff/dtwow) bot created by <@279567692334235649>.\n' + \
+        'I adapt the game Ten Words of Wisdom (TWOW) created by [carykh](https://www.youtube.com/@carykh).\n'
+RULES = 'The rules are explained in [episode 0A](https://youtu.be/S64R-_LVHuY) on his YouTube channel.\n' + \
+        'This bot adapts a few rules to make the format Discord-friendly.\n' + \
+        '- Participants are given a prompt to respond to in 10 words.\n' + \
+        '- Everyone then votes for their favorite responses.\n' + \
+        '- Participants earn a score based on their ranking.\n' + \
+        '- For the IB server, these rounds continue analogous to IB subject grades until a maximum score of 45 is reached.\n'
+ADMIN_NOTE = 'Note: An admin is required to activate TWOW in a text channel.'
+STATUS = {
+    TwowState.REGISTERING: 'Sign-ups open!',
+    TwowState.RESPONDING: 'Round {round} prompt.',
+    TwowState.VOTING: 'Round {round} voting.',
+    TwowState.IDLE: 'Round {round} finished.',
+}
 
+renders = RenderCache()  # /help and /info embeds (shared between calls, never mutate them)
 
-# public commands
 
-@client.tree.command()
-@app_commands.guild_only()
-async def help(interaction: discord.Interaction):
-    """
-    Confused about TWOW? Let me explain it to you!
-    """
-    twow_host_ids = []  # TODO: maybe cache this part somehow
-    async with db.engine.connect() as conn:
-        async for twow_channel in await conn.stream(db.select(TwowChannel)):
-            twow_host_ids.append(twow_channel.host_id)
-
-    is_admin = interaction.user.resolved_permissions.administrator
-    is_twow_host = any(any(host_id == role.id for role in interaction.user.roles) for host_id in twow_host_ids)
+def help_embed(is_admin: bool, is_twow_host: bool):
     embed = discord.Embed(
         title = 'Help Menu',
-        description = 'I am an [open source](https://github.com/ilikecubesnstuff/dtwow) bot created by <@279567692334235649>.\n' + \
-                      'I adapt the game Ten Words of Wisdom (TWOW) created by [carykh](https://www.youtube.com/@carykh).\n' + \
-                      'Note: An admin is required to activate TWOW in a text channel.'
+        description = ABOUT + ADMIN_NOTE
     )
     if not is_admin and not is_twow_host:
-        embed.description = 'I am an [open source](https://github.com/ilikecubesnstuff/dtwow) bot created by <@279567692334235649>.\n' + \
-                            'I adapt the game Ten Words of Wisdom (TWOW) created by [carykh](https://www.youtube.com/@carykh).\n' + \
-                            'The rules are explained in [episode 0A](https://youtu.be/S64R-_LVHuY) on his YouTube channel.\n' + \
-                            'This bot adapts a few rules to make the format Discord-friendly.\n' + \
-                            '- Participants are given a prompt to respond to in 10 words.\n' + \
-                            '- Everyone then votes for their favorite responses.\n' + \
-                            '- Participants earn a score based on their ranking.\n' + \
-                            '- For the IB server, these rounds continue analogous to IB subject grades until a maximum score of 45 is reached.\n' + \
-                            'Join the TWOW channel to participate!\n' + \
-                            'Note: An admin is required to activate TWOW in a text channel.'
+        embed.description = ABOUT + RULES + 'Join the TWOW channel to participate!\n' + ADMIN_NOTE
 
     for command in client.tree.walk_commands():
-        if command.name in ['eval', 'viewtable', 'sync']:
+        if isinstance(command, app_commands.Group):
+            continue
+        if command.name in ['eval', 'viewtable', 'export', 'sync']:
             continue
-        if command.name in ['activate', 'deactivate']:
+        if command.name in ['activate', 'deactivate', 'archive', 'restore']:
             if is_admin:
                 embed.add_field(
                     name = format_cmd(command.name),
@@ -154,10 +263,10 @@ async def help(interaction: discord.Interaction):
                     inline = False
                 )
             continue
-        if command.name in ['signup', 'prompt', 'vote', 'conclude', 'recalculate', 'display', 'hibernate']:
+        if command.qualified_name in ['signup', 'prompt', 'vote', 'conclude', 'deadline', 'recalculate', 'standings', 'display', 'hibernate', 'prompts search']:
             if is_twow_host:
                 embed.add_field(
-                    name = format_cmd(command.name),
+                    name = format_cmd(command.qualified_name),
                     value = 'TWOW host command. ' + command.description,
                     inline = False
                 )
@@ -167,74 +276,111 @@ async def help(interaction: discord.Interaction):
             value = command.description,
             inline = False
         )
-
-    await interaction.response.send_message(embed=embed)
+    return embed
 
 
-@client.tree.command()
-@app_commands.guild_only()
-async def info(interaction: discord.Interaction):
-    """
-    Status of TWOWs in this server.
-    """
+def info_embed(guild_id: int):
     embed = discord.Embed(
         title = 'Info Menu',
-        description = 'I am an [open source](https://github.com/ilikecubesnstuff/dtwow) bot created by <@279567692334235649>.\n' + \
-                      'I adapt the game Ten Words of Wisdom (TWOW) created by [carykh](https://www.youtube.com/@carykh).\n' + \
-                      'The rules are explained in [episode 0A](https://youtu.be/S64R-_LVHuY) on his YouTube channel.\n' + \
-                      'This bot adapts a few rules to make the format Discord-friendly.\n' + \
-                      '- Participants are given a prompt to respond to in 10 words.\n' + \
-                      '- Everyone then votes for their favorite responses.\n' + \
-                      '- Participants earn a score based on their ranking.\n' + \
-                      '- For the IB server, these rounds continue analogous to IB subject grades until a maximum score of 45 is reached.\n\n'
+        description = ABOUT + RULES + '\n'
     )
-    if not client.twows:
+    running = [(channel_id, twow) for channel_id, twow in registry.twows.in_guild(guild_id) if twow.state != TwowState.HIBERNATING]
+    if not running:
         embed.description += 'No currently running TWOWs.'
-        await interaction.response.send_message(embed=embed)
-        return
+        return embed
 
     embed.description += 'Current running TWOWs:'
-    for channel_id, twow in client.twows.items():
-        if twow.state == TwowState.HIBERNATING: continue
-        if twow.state == TwowState.REGISTERING: value = f'Sign-ups open!'
-        if twow.state == TwowState.RESPONDING : value = f'Round {twow.current_round} prompt.'
-        if twow.state == TwowState.VOTING     : value = f'Round {twow.current_round} voting.'
-        if twow.state == TwowState.IDLE       : value = f'Round {twow.current_round} finished.'
+    for channel_id, twow in running:
         embed.add_field(
             name = f'<#{channel_id}>',
-            value = value
+            value = STATUS[twow.state].format(round=twow.current_round)
         )
+    return embed
+
 
+# public commands
+
+@client.tree.command()
+@app_commands.guild_only()
+async def help(interaction: discord.Interaction):
+    """
+    Confused about TWOW? Let me explain it to you!
+    """
+    is_admin = interaction.user.resolved_permissions.administrator
+    is_twow_host = any(role.id in client.host_roles for role in interaction.user.roles)
+    key = ('help', is_admin, is_twow_host)
+    embed = renders.get(key, 0, lambda: help_embed(is_admin, is_twow_host))  # the command list only changes on reconnect
+    await interaction.response.send_message(embed=embed)
+
+
+@client.tree.command()
+@app_commands.guild_only()
+async def info(interaction: discord.Interaction):
+    """
+    Status of TWOWs in this server.
+    """
+    key = ('info', interaction.guild_id)
+    embed = renders.get(key, registry.twows.guild_version(interaction.guild_id), lambda: info_embed(interaction.guild_id))
     await interaction.response.send_message(embed=embed)
 
 
+@client.tree.command()
+@app_commands.guild_only()
+@app_commands.describe(user='Member to show statistics for. (Leave empty for server-wide statistics.)')
+async def stats(interaction: discord.Interaction, user: Optional[discord.Member] = None):
+    """
+    TWOW statistics across seasons in this server.
+    """
+    game = await games.for_channel(interaction.channel_id)
+    if user:
+        content = await game.stats.user_report(interaction.guild_id, user.id, user.display_name)
+    else:
+        content = await game.stats.guild_report(interaction.guild_id)
+    await interaction.response.send_message(content[0:2000], allowed_mentions=discord.AllowedMentions.none())
+
+
 # administrative commands
 
 @client.tree.command()
 @app_commands.default_permissions(administrator=True)
 @app_commands.guild_only()
-@app_commands.describe(host='TWOW host role. (Users with this role must have permission to manage threads in this channel.)')
-async def activate(interaction: discord.Interaction, host: discord.Role):
+@app_commands.describe(
+    host='TWOW host role. (Users with this role must have permission to manage threads in this channel.)',
+    preset='Game variant to play in this channel. (Defaults to the configured preset.)'
+)
+async def activate(interaction: discord.Interaction, host: discord.Role, preset: Optional[str] = None):
     """
     Allow TWOW seasons to take place in a channel. Must assign a role as TWOW host.
     """
+    preset = preset or games.default
     if not isinstance(interaction.channel, discord.TextChannel):
         await interaction.response.send_message(f'🚫 TWOW only works in text channels.')
         logger.warning(f'{info_chip(interaction)} Activation attempted in an unsupported channel.')
         return
 
-    if interaction.channel_id in client.twows:
+    if interaction.channel_id in registry.twows:
         await interaction.response.send_message(f'🚫 TWOW already active in this channel. Please use {format_cmd("signup")} to start TWOW here.')
-        state = client.twows[interaction.channel_id].state.name
+        state = registry.twows.get(interaction.channel_id).state.name
         logger.warning(f'{info_chip(interaction)} Activation attempted while {state}. {state} state preserved.')
         return
 
-    twow_channel = TwowChannel(id=interaction.channel_id, host_id=host.id)
-    client.twows[interaction.channel_id] = Twow(state=TwowState.HIBERNATING)
+    if preset not in games.available():
+        await interaction.response.send_message(f'🚫 Unknown preset {preset}. Available presets: {", ".join(games.available())}', ephemeral=True)
+        return
+
+    twow_channel = TwowChannel(id=interaction.channel_id, host_id=host.id, preset=preset, current_twow_id=None, deleted=False)
     async with db.session() as session, session.begin():
-        session.add(twow_channel)
+        await session.merge(twow_channel)  # revives the row if the channel was deactivated but not purged yet
+    games.assign(interaction.channel_id, preset)
+    client.set_host(interaction.channel_id, host.id)
+    async with registry.twows.lock(interaction.channel_id):
+        registry.twows.publish(interaction.channel_id, Twow(channel_id=interaction.channel_id, guild_id=interaction.guild_id, state=TwowState.HIBERNATING))
     await interaction.response.send_message('TWOW activated!')
-    logger.info(f'{info_chip(interaction)} TWOW activated, state set to HIBERNATING.')
+    logger.info(f'{info_chip(interaction)} TWOW activated with preset {preset}, state set to HIBERNATING.')
+
+@activate.autocomplete('preset')
+async def preset_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=name, value=name) for name in games.available() if current.lower() in name.lower()][:25]
 
 
 @client.tree.command()
@@ -244,49 +390,193 @@ async def deactivate(interaction: discord.Interaction):
     """
     Disallow TWOW season to take place in a channel. This will end on-going TWOW seasons.
     """
-    if interaction.channel_id not in client.twows:
+    if interaction.channel_id not in registry.twows:
         await interaction.response.send_message(f'🚫 TWOW already inactive in this channel. Please use {format_cmd("activate")} to activate TWOW here.')
         logger.warning(f'{info_chip(interaction)} INACTIVE attempted while INACTIVE. INACTIVE state preserved.')
         return
 
-    # disable old view
-    twow = client.twows[interaction.channel_id]
-    if twow.current_message_id:
-        old_message = await interaction.channel.fetch_message(twow.current_message_id)
-        old_view_cls = state_view_map[twow.state]
-        view = old_view_cls(twow)
-        for item in view.children:
-            item.disabled = True
-        await old_message.edit(content=old_message.content, view=view)
-        view.stop()
-
-    twow_channel = await db.fetch_by_id(TwowChannel, interaction.channel_id)
-    if interaction.channel_id in client.twows:
-        del client.twows[interaction.channel_id]
-    async with db.session() as session, session.begin():
-        await session.delete(twow_channel)
+    game = await games.for_channel(interaction.channel_id)
+    async with registry.twows.lock(interaction.channel_id):
+        twow = registry.twows.get(interaction.channel_id)
+        old_message_id, old_state = twow.current_message_id, twow.state
+
+        async with db.session() as session, session.begin():
+            await session.execute(db.update(TwowChannel).where(TwowChannel.id == interaction.channel_id).values(deleted=True))
+        registry.twows.remove(interaction.channel_id)
+    if hasattr(game.module, 'vote'):
+        game.vote.end_voting(twow.id)
+    games.unassign(interaction.channel_id)
+    client.set_host(interaction.channel_id, None)
+    client.scheduler.cancel(interaction.channel_id)
     await interaction.response.send_message('TWOW deactivated!')
     logger.info(f'{info_chip(interaction)} TWOW deactivated, state set to INACTIVE.')
 
+    # disable old view
+    if old_message_id:
+        client.background(disable_message(interaction.channel, old_message_id, game.disabled_views[old_state]))
+
+
+@client.tree.command()
+@app_commands.default_permissions(administrator=True)
+@app_commands.guild_only()
+@app_commands.describe(twow_id='ID of a finished TWOW season.')
+async def archive(interaction: discord.Interaction, twow_id: int):
+    """
+    Move a finished TWOW season out of the live database into a compact archive.
+    """
+    twow = await db.fetch_by_id(Twow, twow_id)
+    if not twow or twow.guild_id != interaction.guild_id:
+        await interaction.response.send_message(f'🚫 No TWOW with ID {twow_id} in this server.', ephemeral=True)
+        return
+    if twow.state != TwowState.HIBERNATING:
+        await interaction.response.send_message(f'🚫 TWOW {twow_id} is still running! Only finished seasons can be archived.', ephemeral=True)
+        logger.warning(f'{info_chip(interaction)} Archive of TWOW {twow_id} attempted while {twow.state.name}.')
+        return
+    game = await games.for_channel(twow.channel_id)
+    if game.archive.exists(twow_id):
+        await interaction.response.send_message(f'🚫 TWOW {twow_id} is already archived.', ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    await game.stats.refresh(twow_id)
+    counts = await game.archive.dump(twow_id)
+    game.tally.discard(twow_id)
+    if hasattr(game.module, 'vote'):
+        game.vote.end_voting(twow_id)
+    await interaction.followup.send(f'TWOW {twow_id} archived! ({", ".join(f"{n} {name}" for name, n in counts.items())})', ephemeral=True)
+    logger.info(f'{info_chip(interaction)} TWOW {twow_id} archived.')
+
+
+@client.tree.command()
+@app_commands.default_permissions(administrator=True)
+@app_commands.guild_only()
+@app_commands.describe(twow_id='ID of an archived TWOW season.')
+async def restore(interaction: discord.Interaction, twow_id: int):
+    """
+    Move an archived TWOW season back into the live database.
+    """
+    twow = await db.fetch_by_id(Twow, twow_id)
+    game = await games.for_channel(twow.channel_id) if twow else None
+    if not twow or twow.guild_id != interaction.guild_id or not game.archive.exists(twow_id):
+        await interaction.response.send_message(f'🚫 No archived TWOW with ID {twow_id} in this server.', ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    try:
+        counts = await game.archive.restore(twow_id)
+    except Exception:
+        logger.exception(f'{info_chip(interaction)} Restoring TWOW {twow_id} failed.')
+        await interaction.followup.send(f'🚫 TWOW {twow_id} could not be restored, it is still archived. (See the logs for details.)', ephemeral=True)
+        return
+    await interaction.followup.send(f'TWOW {twow_id} restored! ({", ".join(f"{n} {name}" for name, n in counts.items())})', ephemeral=True)
+    logger.info(f'{info_chip(interaction)} TWOW {twow_id} restored from archive.')
+
 
 # host commands (requires manage thread permissions)
 
+async def transition(
+        channel: discord.TextChannel,
+        version: int,
+        new_state: TwowState,
+        message_content: str,
+        db_func: Coroutine,
+        post: Optional[Coroutine] = None,
+        chip: str = ''):
+    """
+    Move a TWOW to a new state: post the new state's message, then apply the change to the database.
+    The message is posted with `post(content, view)` (defaults to sending it in the channel).
+    Raises StaleState if the channel's state changed since `version` was read.
+    """
+    post = post or (lambda content, view: channel.send(content, view=view))
+    game = await games.for_channel(channel.id)
+
+    # checks that must finish before the new state's message goes up (outside the lock, they may post to the host thread)
+    if new_state == TwowState.VOTING and hasattr(game.module, 'dedup'):
+        registry.twows.check(channel.id, version)
+        try:
+            await game.dedup.report(registry.twows.get(channel.id), channel)
+        except Exception:
+            logger.exception(f'{chip} Duplicate check failed, opening voting anyway.')
+
+    async with registry.twows.lock(channel.id):
+        registry.twows.check(channel.id, version)
+        twow = registry.twows.get(channel.id)
+        old_message_id, old_state = twow.current_message_id, twow.state
+
+        # reserve a new TWOW if necessary (its ID is part of the sign-up message)
+        if new_state == TwowState.REGISTERING:
+            async with db.session() as session, session.begin():
+                stmt = db.insert(Twow).returning(Twow)
+                twow = (await session.scalars(stmt, [dict(
+                    guild_id = channel.guild.id,
+                    channel_id = channel.id,
+                    current_round = 0,
+                    state = None
+                )])).one()
+                stmt = db.insert(Transition).returning(Transition.id)
+                transition_id = (await session.scalars(stmt, [dict(
+                    channel_id = channel.id,
+                    twow_id = twow.id,
+                    from_state = old_state,
+                    to_state = new_state,
+                    completed = False
+                )])).one()
+
+        view = game.views[new_state](twow)
+        message = await post(message_content(twow), view)
+
+        # apply the whole transition in one transaction, on a fresh copy (the canonical TWOW is never mutated)
+        async with db.session() as session, session.begin():
+            if new_state == TwowState.REGISTERING:
+                session.add(twow)
+            else:
+                twow = await session.get(Twow, twow.id)
+            await db_func(session, twow, message)
+            twow.deadline = None
+            if new_state == TwowState.REGISTERING:
+                stmt = db.update(TwowChannel).where(TwowChannel.id == channel.id).values(current_twow_id=twow.id)
+                await session.execute(stmt)
+                stmt = db.update(Transition).where(Transition.id == transition_id).values(message_id=message.id, completed=True)
+                await session.execute(stmt)
+            else:
+                session.add(Transition(
+                    channel_id = channel.id,
+                    twow_id = twow.id,
+                    from_state = old_state,
+                    to_state = new_state,
+                    message_id = message.id,
+                    completed = True
+                ))
+        registry.twows.publish(channel.id, twow)
+        client.scheduler.cancel(channel.id)
+    logger.info(f'{chip} State set to {new_state.name}.')
+
+    if old_state == TwowState.VOTING and hasattr(game.module, 'vote'):
+        game.vote.end_voting(twow.id)
+
+    # disable old view (after the new prompt is up, off the critical path)
+    if old_message_id:
+        client.background(disable_message(channel, old_message_id, game.disabled_views[old_state]))
+
+    return twow
+
+
 async def twow_cmd(
         interaction: discord.Interaction,
         new_state: TwowState,
         invalid_entry_dict: dict[TwowState, str],
         message_content: str,
-        view_cls,
         db_func: Coroutine):
     """
     Execute a valid step forward in the TWOW process. This is only called through application commands in this file.
     """
-    if interaction.channel_id not in client.twows:
+    entry = registry.twows.entry(interaction.channel_id)
+    if entry is None:
         await interaction.response.send_message(f'🚫 TWOW is not active in this channel. Please use {format_cmd("activate")} to activate TWOW here.')
         logger.warning(f'{info_chip(interaction)} {new_state.name} attempted while INACTIVE. INACTIVE state preserved.')
         return
 
-    twow = client.twows[interaction.channel_id]
+    twow = entry.twow
     for state, message in invalid_entry_dict.items():
         if twow.state == state:
             await interaction.response.send_message(message, ephemeral=True)
@@ -294,43 +584,67 @@ async def twow_cmd(
             return
     logger.info(f'{info_chip(interaction)} Changing state from {twow.state.name} to {new_state.name}.')
 
-    # disable old view
-    if twow.current_message_id:
-        old_message = await interaction.channel.fetch_message(twow.current_message_id)
-        old_view_cls = state_view_map[twow.state]
-        view = old_view_cls(twow)
-        for item in view.children:
-            item.disabled = True
-        await old_message.edit(content=old_message.content, view=view)
-        view.stop()
-
-    # create new TWOW if necessary
-    if new_state == TwowState.REGISTERING:
-        async with db.session() as session:
-            twow_channel = await session.get(TwowChannel, interaction.channel_id)
-            twow = Twow(
-                guild_id = interaction.guild_id,
-                channel_id = interaction.channel_id,
-                current_round = 0,
-                state = TwowState.REGISTERING
-            )
-            session.add_all([twow_channel, twow])
-            await session.commit()
+    async def post(content, view):
+        if interaction.response.is_done():
+            return await interaction.followup.send(content, view=view, wait=True)
+        await interaction.response.send_message(content, view=view)
+        return await interaction.original_response()
 
-            twow_channel.current_twow_id = twow.id
-            await session.commit()
-        client.twows[interaction.channel_id] = twow
+    if new_state == TwowState.VOTING:
+        await interaction.response.defer(thinking=True)  # the duplicate check runs before voting opens
 
-    view = view_cls(twow)
-    await interaction.response.send_message(message_content(twow), view=view)
-    message = await interaction.original_response()
-    async with db.session() as session:
-        session.add(twow)
-        await db_func(session, twow, message)
-        await session.commit()
-    logger.info(f'{info_chip(interaction)} State set to {new_state.name}.')
+    try:
+        return await transition(interaction.channel, entry.version, new_state, message_content, db_func, post=post, chip=info_chip(interaction))
+    except StaleState:
+        await reply(interaction, '🚫 This TWOW changed in the meantime, please try again.', ephemeral=True)
+        logger.warning(f'{info_chip(interaction)} {new_state.name} dropped, state changed concurrently.')
 
-    return twow
+
+# transitions that can also be triggered by deadlines
+
+async def vote_db_update(session, twow, message):
+    twow.current_message_id = message.id
+    twow.state = TwowState.VOTING
+
+def vote_message(twow):
+    return f'Round {twow.current_round} voting is open!'
+
+async def conclude_db_update(session, twow, message):
+    twow.current_message_id = message.id
+    twow.state = TwowState.IDLE
+
+def conclude_message(twow):
+    return f'Round {twow.current_round} voting is now closed.'
+
+async def conclude_results(twow, force: bool = False):
+    game = await games.for_channel(twow.channel_id)
+    await game.results.update(twow, force=force)
+    await game.stats.refresh(twow.id, rounds=[twow.current_round])
+
+
+async def on_deadline(channel_id: int):
+    """
+    Scheduler callback: advance a TWOW whose deadline has passed.
+    """
+    await client.wait_until_ready()
+    entry = registry.twows.entry(channel_id)
+    channel = client.get_channel(channel_id)
+    if not entry or not channel:
+        logger.warning(f'Deadline passed for channel {channel_id}, but no active TWOW was found there.')
+        return
+
+    chip = f'[{channel.guild.name} | {channel.name} | deadline]'
+    twow = entry.twow
+    try:
+        if twow.state == TwowState.RESPONDING:
+            await transition(channel, entry.version, TwowState.VOTING, vote_message, vote_db_update, chip=chip)
+        elif twow.state == TwowState.VOTING:
+            twow = await transition(channel, entry.version, TwowState.IDLE, conclude_message, conclude_db_update, chip=chip)
+            await conclude_results(twow)
+        else:
+            logger.warning(f'{chip} Deadline passed while {twow.state.name}, nothing to do.')
+    except StaleState:
+        logger.warning(f'{chip} Deadline dropped, state changed concurrently.')
 
 
 @client.tree.command()
@@ -356,7 +670,6 @@ async def signup(interaction: discord.Interaction, prompt: str):
             TwowState.IDLE: '🚫 Cannot open sign-ups in the middle of a TWOW season.'
         },
         message_content=lambda twow: f'TWOW sign-ups are open! (ID: {twow.id})\nRound {twow.current_round} Prompt:\n# {prompt}',
-        view_cls=game.signup.SignUpView,
         db_func=db_entry_update
     )
 
@@ -384,7 +697,6 @@ async def prompt(interaction: discord.Interaction, prompt: str):
             TwowState.HIBERNATING: f'🚫 No TWOW season. To start a new TWOW season, use {format_cmd("signup")}.'
         },
         message_content=lambda twow: f'Round {twow.current_round} Prompt:\n# {prompt}',
-        view_cls=game.prompt.SubmissionView,  # TODO: fix this
         db_func=db_entry_update
     )
 
@@ -396,10 +708,6 @@ async def vote(interaction: discord.Interaction):
     """
     Commence voting for a TWOW round.
     """
-    async def db_entry_update(session, twow, message):
-        twow.current_message_id = message.id
-        twow.state = TwowState.VOTING
-
     await twow_cmd(
         interaction,
         new_state=TwowState.VOTING,
@@ -408,9 +716,8 @@ async def vote(interaction: discord.Interaction):
             TwowState.IDLE: '🚫 No active TWOW round! Cannot commence voting.',
             TwowState.HIBERNATING: '🚫 No active TWOW round! Cannot commence voting.'
         },
-        message_content=lambda twow: f'Round {twow.current_round} voting is open!',
-        view_cls=game.vote.VotingView,
-        db_func=db_entry_update
+        message_content=vote_message,
+        db_func=vote_db_update
     )
 
 
@@ -421,10 +728,6 @@ async def conclude(interaction: discord.Interaction):
     """
     Conclude voting for a TWOW round.
     """
-    async def db_entry_update(session, twow, message):
-        twow.current_message_id = message.id
-        twow.state = TwowState.IDLE
-
     twow = await twow_cmd(
         interaction,
         new_state=TwowState.IDLE,
@@ -434,13 +737,41 @@ async def conclude(interaction: discord.Interaction):
             TwowState.IDLE: f'🚫 No active round? Use {format_cmd("prompt")} to start a TWOW round.',
             TwowState.HIBERNATING: f'🚫 No active round? Use {format_cmd("signup")} to start a TWOW season.'
         },
-        message_content=lambda twow: f'Round {twow.current_round} voting is now closed.',
-        view_cls=EmptyView,  # TODO: fix this
-        db_func=db_entry_update
+        message_content=conclude_message,
+        db_func=conclude_db_update
     )
 
     if twow:
-        await game.results.update(twow)
+        await conclude_results(twow)
+
+@client.tree.command()
+@app_commands.default_permissions(manage_threads=True)
+@app_commands.guild_only()
+@app_commands.describe(minutes='Minutes until the current phase ends automatically. (0 clears the deadline.)')
+async def deadline(interaction: discord.Interaction, minutes: app_commands.Range[int, 0, 60 * 24 * 14]):
+    """
+    Automatically open voting (or conclude voting) after a number of minutes.
+    """
+    twow = registry.twows.get(interaction.channel_id)
+    if not twow or twow.state not in (TwowState.RESPONDING, TwowState.VOTING):
+        await interaction.response.send_message(f'🚫 Deadlines can only be set while a round or voting is active.', ephemeral=True)
+        logger.warning(f'{info_chip(interaction)} Deadline attempted while not RESPONDING or VOTING.')
+        return
+
+    when = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=minutes) if minutes else None
+    async with registry.twows.write(interaction.channel_id) as (session, twow):
+        twow.deadline = when
+
+    if not when:
+        client.scheduler.cancel(interaction.channel_id)
+        await interaction.response.send_message('Deadline cleared.', ephemeral=True)
+        logger.info(f'{info_chip(interaction)} Deadline cleared.')
+        return
+
+    client.scheduler.schedule(interaction.channel_id, when.timestamp())
+    action = 'Voting opens' if twow.state == TwowState.RESPONDING else 'Voting closes'
+    await interaction.response.send_message(f'{action} {discord.utils.format_dt(when, "R")}.')
+    logger.info(f'{info_chip(interaction)} Deadline set for {when}.')
 
 @client.tree.command(name='recalculate')
 @app_commands.default_permissions(manage_threads=True)
@@ -449,14 +780,35 @@ async def recalculate_results(interaction: discord.Interaction):
     """
     Recalculate results for the current TWOW rounds.
     """
-    twow = client.twows[interaction.channel_id]
-    if twow.state != TwowState.IDLE:
+    twow = registry.twows.get(interaction.channel_id)
+    if not twow or twow.state != TwowState.IDLE:
         await interaction.response.send_message(f'🚫 You can only recalculate results after concluding voting.')
         logger.warning(f'{info_chip(interaction)} Result presentation attempted while not IDLE.')
         return
-    await game.results.update(twow)
+    await conclude_results(twow, force=True)
     await interaction.response.send_message('Results recalculated!', ephemeral=True)
 
+@client.tree.command()
+@app_commands.default_permissions(manage_threads=True)
+@app_commands.guild_only()
+async def standings(interaction: discord.Interaction):
+    """
+    Preview provisional standings for the current TWOW round.
+    """
+    if interaction.channel_id not in registry.twows:
+        await interaction.response.send_message(f'🚫 TWOW is not active in this channel. Please use {format_cmd("activate")} to activate TWOW here.', ephemeral=True)
+        return
+
+    twow = registry.twows.get(interaction.channel_id)
+    if twow.state not in (TwowState.VOTING, TwowState.IDLE):
+        await interaction.response.send_message(f'🚫 Standings are only available once voting has started.', ephemeral=True)
+        logger.warning(f'{info_chip(interaction)} Standings preview attempted while {twow.state.name}.')
+        return
+
+    game = await games.for_channel(interaction.channel_id)
+    content = await game.results.standings(twow)
+    await interaction.response.send_message(content[0:2000], ephemeral=True)
+
 @client.tree.command(name='display')
 @app_commands.default_permissions(manage_threads=True)
 @app_commands.guild_only()
@@ -476,12 +828,13 @@ async def display_results(interaction: discord.Interaction, channel: Optional[di
         await interaction.followup.send('Cannot use this command in a forum channel!', ephemeral=True)
         return
 
-    twow = client.twows[channel.parent_id]
+    twow = registry.twows.get(channel.parent_id)
     if twow.state != TwowState.IDLE:
         await interaction.response.send_message(f'🚫 You can only present results after concluding voting.')
         logger.warning(f'{info_chip(interaction)} Result presentation attempted while not IDLE.')
         return
 
+    game = await games.for_channel(channel.parent_id)
     status = await game.results.display(twow, channel)
     await interaction.followup.send(status, ephemeral=True)
 
@@ -507,11 +860,38 @@ async def hibernate(interaction: discord.Interaction):
             TwowState.HIBERNATING: '🚫 Already hibernating!'
         },
         message_content=lambda twow: f'After {twow.current_round} rounds, this TWOW season is over!',
-        view_cls=game.hibernate.HibernationView,
         db_func=db_entry_update
     )
 
 
+prompts = app_commands.Group(
+    name='prompts',
+    description='Browse the prompts suggested in this server.',
+    default_permissions=discord.Permissions(manage_threads=True),
+    guild_only=True
+)
+client.tree.add_command(prompts)
+
+@prompts.command(name='search')
+@app_commands.describe(query='Words to search for. (Leave empty to list the newest prompts.)', page='Page to start on.')
+async def search_prompts(interaction: discord.Interaction, query: str = '', page: int = 1):
+    """
+    Search the prompts suggested in this server.
+    """
+    async def fetch_page(page: int):
+        results, pages = await pool.search(interaction.guild_id, query, page)
+        if not results:
+            return 'No prompts found.'
+        lines = [f'**Prompts** (page {page}/{pages})' + (f' matching "{query}"' if query else '')]
+        lines += [f'- "{prompt.content}" (by <@{prompt.user_id}>)' for prompt in results]
+        return '\n'.join(lines)[0:2000]
+
+    _, pages = await pool.search(interaction.guild_id, query, 1)
+    page = min(max(page, 1), pages)
+    view = PageView(fetch_page, page=page, pages=pages)
+    await interaction.response.send_message(await fetch_page(page), view=view, ephemeral=True)
+
+
 # developer commands
 
 @client.tree.command(name='eval')
@@ -530,7 +910,8 @@ async def evaluate(interaction: discord.Interaction, code: str):
         'guild': interaction.guild,
         'message': interaction.message,
         'db': db,
-        'game': game,
+        'games': games,
+        'game': games.get(interaction.channel_id),
     }
 
     stdout = io.StringIO()
@@ -549,13 +930,29 @@ async def evaluate(interaction: discord.Interaction, code: str):
     await interaction.response.send_message(result[0:2000])
 
 
+TABLE_PAGE_SIZE = 15
+TABLE_LINE_WIDTH = 110
+
 @client.tree.command()
 @app_commands.default_permissions(administrator=True)
 @app_commands.guilds(int(config['test server']['id']))
-async def viewtable(interaction: discord.Interaction, name: Literal['participant', 'response', 'vote', 'twow', 'twowchannel']):
+@app_commands.describe(
+    columns='Comma-separated columns to show. (Defaults to all columns.)',
+    twow_id='Only show rows belonging to this TWOW.',
+    round='Only show rows from this round.',
+    page='Page to start on.'
+)
+async def viewtable(
+        interaction: discord.Interaction,
+        name: Literal['participant', 'response', 'vote', 'twow', 'twowchannel'],
+        columns: Optional[str] = None,
+        twow_id: Optional[int] = None,
+        round: Optional[int] = None,
+        page: int = 1):
     """
     View one of the tables stored in the database.
     """
+    game = await games.for_channel(interaction.channel_id)
     cls = {
         'participant': game.tables.Participant,
         'response': game.tables.Response,
@@ -563,10 +960,58 @@ async def viewtable(interaction: discord.Interaction, name: Literal['participant
         'twow': Twow,
         'twowchannel': TwowChannel
     }[name]
-    async with db.session() as session, session.begin():
-        stmt = db.select(cls)
-        entries = (await session.scalars(stmt)).all()
-    await interaction.response.send_message('```' + '\n'.join(repr(entry) for entry in entries) + '```')
+    table = cls.__table__
+
+    names = [column.strip() for column in columns.split(',')] if columns else table.columns.keys()
+    unknown = [column for column in names if column not in table.columns]
+    if unknown:
+        await interaction.response.send_message(f'🚫 Unknown column(s) {", ".join(unknown)}. Available: {", ".join(table.columns.keys())}', ephemeral=True)
+        return
+
+    filters = []
+    for column, value in [('twow_id', twow_id), ('round', round)]:
+        if value is None:
+            continue
+        column = 'id' if cls is Twow and column == 'twow_id' else column
+        column = 'current_round' if cls is Twow and column == 'round' else column
+        if column not in table.columns:
+            await interaction.response.send_message(f'🚫 Table {name} cannot be filtered by {column}.', ephemeral=True)
+            return
+        filters.append(table.columns[column] == value)
+
+    async with db.session() as session:
+        stmt = db.select(db.func.count()).select_from(table).where(*filters)
+        total = (await session.execute(stmt)).scalar_one()
+    pages = max(1, -(-total // TABLE_PAGE_SIZE))
+
+    async def fetch_page(page: int):
+        stmt = db.select(*(table.columns[column] for column in names)).where(*filters) \
+            .order_by(*table.primary_key.columns).limit(TABLE_PAGE_SIZE).offset((page - 1) * TABLE_PAGE_SIZE)
+        async with db.session() as session:
+            rows = (await session.execute(stmt)).all()
+        lines = [' | '.join(names)] + [' | '.join(repr(value) for value in row) for row in rows]
+        lines = [line if len(line) <= TABLE_LINE_WIDTH else line[:TABLE_LINE_WIDTH - 1] + '…' for line in lines]
+        return f'{name}: {total} row(s), page {page}/{pages}\n```' + '\n'.join(lines) + '```'
+
+    page = min(max(page, 1), pages)
+    view = PageView(fetch_page, page=page, pages=pages)
+    await interaction.response.send_message(await fetch_page(page), view=view)
+
+
+@client.tree.command(name='export')
+@app_commands.default_permissions(administrator=True)
+@app_commands.guilds(int(config['test server']['id']))
+@app_commands.describe(directory='Directory (on the bot host) to write the export to.')
+async def export_data(interaction: discord.Interaction, directory: str, format: Literal['jsonl', 'csv'] = 'jsonl'):
+    """
+    Export a consistent snapshot of every table without pausing the bot.
+    """
+    await interaction.response.defer(ephemeral=True)
+    for name in games.available():
+        await games.load(name)  # presets register their tables when loaded, so unloaded ones would be left out
+    counts = await transfer.export(directory, format)
+    await interaction.followup.send(f'Exported {sum(counts.values())} rows to `{directory}`.', ephemeral=True)
+    logger.info(f'{info_chip(interaction)} Data exported to {directory}.')
 
 
 @client.tree.command()
@@ -574,10 +1019,13 @@ async def viewtable(interaction: discord.Interaction, name: Literal['participant
 @app_commands.guilds(int(config['test server']['id']))
 async def sync(interaction: discord.Interaction):
     """
-    Sync global app commands to discord.
+    Sync global app commands to discord, and re-sync this server's commands even if they look unchanged.
     """
+    await interaction.response.defer()
     app_commands = await client.tree.sync()
-    await interaction.response.send_message(f'Synced {len(app_commands)} commands!')
+    await client.sync_tree(interaction.guild, force=True)
+    await interaction.followup.send(f'Synced {len(app_commands)} commands!')
 
 
-client.run(config['discord']['token'])
\ No newline at end of file
+if __name__ == '__main__':
+    client.run(config['discord']['token'])
\ No newline at end of file
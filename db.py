@@ -1,9 +1,14 @@
-from sqlalchemy import Integer, String, Float, DateTime, Enum, ForeignKey
-from sqlalchemy import select, insert
+from sqlalchemy import Integer, String, Float, Boolean, DateTime, Enum, ForeignKey, Index, UniqueConstraint
+from sqlalchemy import select, insert, update, delete, and_, or_, case, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass, Mapped, mapped_column
 from sqlalchemy.ext.asyncio import AsyncAttrs, create_async_engine, async_sessionmaker
 import sqlalchemy.sql.functions as func
 
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
 engine = create_async_engine('sqlite+aiosqlite:///twow_data.db')
 session = async_sessionmaker(engine, expire_on_commit=False)
 
@@ -39,6 +44,7 @@ class Twow(Base):
     current_round = mapped_column(Integer, default=0)
     state = mapped_column(Enum(TwowState))
     start_timestamp = mapped_column(DateTime(timezone=True), default=func.now())
+    deadline = mapped_column(DateTime(timezone=True), nullable=True)  # UTC, end of the current phase
 
     def __repr__(self):
         return f'Twow({self.state}, round={self.current_round}, channel={self.channel_id}, guild={self.guild_id})'
@@ -50,9 +56,15 @@ class TwowChannel(Base):
     id = mapped_column(Integer, primary_key=True, autoincrement='ignore_fk')
     host_id = mapped_column(Integer)
     current_twow_id = mapped_column(Integer, nullable=True)
+    preset = mapped_column(String, nullable=True)  # game preset played in this channel (None for the default preset)
+    deleted = mapped_column(Boolean, default=False)  # deactivated, purged later by the compactor
+
+    __table_args__ = (
+        Index('ix_channels_deleted', 'id', sqlite_where=deleted.is_(True)),
+    )
 
     def __repr__(self):
-        return f'TwowChannel({self.id}, host_id={self.host_id}, twow_id={self.current_twow_id})'
+        return f'TwowChannel({self.id}, host_id={self.host_id}, twow_id={self.current_twow_id}, preset={self.preset})'
 
     @classmethod
     async def fetch_by_id(cls, channel_id, /):
@@ -62,16 +74,135 @@ class TwowChannel(Base):
         return channel
 
 
+class Transition(Base):
+    __tablename__ = 'transitions'
+
+    id = mapped_column(Integer, primary_key=True, autoincrement=True)
+    channel_id = mapped_column(Integer)
+    twow_id = mapped_column(Integer)
+    from_state = mapped_column(Enum(TwowState), nullable=True)
+    to_state = mapped_column(Enum(TwowState))
+    message_id = mapped_column(Integer, nullable=True)
+    completed = mapped_column(Boolean, default=False)
+    timestamp = mapped_column(DateTime(timezone=True), default=func.now())
+
+    # only pending transitions are indexed, so recovery never scans the whole log
+    __table_args__ = (
+        Index('ix_transitions_pending', 'id', sqlite_where=completed.is_(False)),
+    )
+
+    def __repr__(self):
+        return f'Transition({self.id}, {self.from_state} -> {self.to_state}, channel={self.channel_id}, twow_id={self.twow_id}, completed={self.completed})'
+
+
 class Prompt(Base):
     __tablename__ = 'prompts'
 
     id = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id = mapped_column(Integer)
+    guild_id = mapped_column(Integer, nullable=True)
     content = mapped_column(String)
     timestamp = mapped_column(DateTime(timezone=True), default=func.now())
 
+    def __repr__(self):
+        return f'Prompt({self.id}, user_id={self.user_id}, guild={self.guild_id})'
+
+
+class PromptBand(Base):
+    __tablename__ = 'prompt_bands'
+
+    # one row per LSH band of a prompt's MinHash signature, see utils/minhash.py
+    prompt_id = mapped_column(ForeignKey('prompts.id', ondelete='CASCADE'), primary_key=True)
+    band = mapped_column(Integer, primary_key=True)
+    bucket = mapped_column(Integer)
+
+    __table_args__ = (
+        Index('ix_prompt_bands_bucket', 'band', 'bucket'),
+    )
+
+
+# external content FTS5 index over prompts, kept in sync by triggers
+PROMPT_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS prompts_fts USING fts5(content, content='prompts', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS prompts_fts_insert AFTER INSERT ON prompts BEGIN "
+    "INSERT INTO prompts_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS prompts_fts_delete AFTER DELETE ON prompts BEGIN "
+    "INSERT INTO prompts_fts(prompts_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS prompts_fts_update AFTER UPDATE OF content ON prompts BEGIN "
+    "INSERT INTO prompts_fts(prompts_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO prompts_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+
+def _literal(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _migrate(conn, tables=None):
+    """
+    Bring tables created by older versions up to date, since `create_all` never alters existing tables.
+    Adds missing columns (backfilling constant defaults, other columns start out NULL), unique constraints and indexes.
+    Safe to run on every start.
+    """
+    for table in tables or Base.metadata.sorted_tables:
+        existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=conn.dialect)}'
+            if column.default is not None and column.default.is_scalar:
+                ddl += f' DEFAULT {_literal(column.default.arg)}'
+            conn.exec_driver_sql(ddl)
+            logger.info(f'Added column {table.name}.{column.name}.')
+
+        for constraint in table.constraints:
+            if not isinstance(constraint, UniqueConstraint):
+                continue
+            names = [column.name for column in constraint.columns]
+            unique = {
+                tuple(info[2] for info in conn.exec_driver_sql(f'PRAGMA index_info("{index[1]}")'))
+                for index in conn.exec_driver_sql(f'PRAGMA index_list("{table.name}")') if index[2]
+            }
+            if tuple(names) in unique:
+                continue
+            # older versions did not enforce uniqueness, keep the first of any duplicates
+            keys = ', '.join(f'"{name}"' for name in names)
+            removed = conn.exec_driver_sql(
+                f'DELETE FROM "{table.name}" WHERE rowid NOT IN (SELECT MIN(rowid) FROM "{table.name}" GROUP BY {keys})'
+            ).rowcount
+            if removed:
+                logger.warning(f'Removed {removed} duplicate row(s) from {table.name} before enforcing uniqueness of {names}.')
+            conn.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS "uq_{table.name}_{"_".join(names)}" ON "{table.name}" ({keys})')
+            logger.info(f'Enforced uniqueness of {table.name} {names}.')
+
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def migrate(tables=None):
+    """
+    Create missing tables and upgrade existing ones (all of them, or only `tables`).
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+        await conn.run_sync(_migrate, tables)
+
 
 async def init():
     async with engine.begin() as conn:
+        # write-ahead logging lets readers (e.g. exports) hold a snapshot without blocking writers
+        await conn.exec_driver_sql('PRAGMA journal_mode=WAL')
         # await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+    await migrate()
+
+    async with engine.begin() as conn:
+        indexed = (await conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'prompts_fts'")).first()
+        for statement in PROMPT_SEARCH_DDL:
+            await conn.exec_driver_sql(statement)
+        if not indexed:
+            # index the prompts that were submitted before the search index existed
+            await conn.exec_driver_sql("INSERT INTO prompts_fts(prompts_fts) VALUES ('rebuild')")
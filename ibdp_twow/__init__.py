@@ -1,5 +1,48 @@
-from . import signup
-from . import prompt
-from . import vote
-from . import results
-from . import hibernate
+import time
+import importlib
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+
+TABLE_PREFIX = 'ib_'  # every table of this preset is named ib_*
+
+# submodules are imported on first access (PEP 562), so commands that are never used never pay for their imports
+SUBMODULES = ['tables', 'signup', 'prompt', 'tally', 'vote', 'results', 'host', 'hibernate', 'archive', 'stats', 'dedup']
+import_times: dict[str, float] = {}  # seconds spent importing each submodule (including submodules it imports first)
+
+
+def __getattr__(name: str):
+    if name not in SUBMODULES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    start = time.perf_counter()
+    module = importlib.import_module(f'.{name}', __name__)
+    import_times[name] = time.perf_counter() - start
+    logger.debug(f'Imported {__name__}.{name} in {1000 * import_times[name]:.1f} ms.')
+    return module
+
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBMODULES))
+
+
+def state_views():
+    """
+    View class of each TWOW state.
+    """
+    from db import TwowState
+    from utils.views import EmptyView
+    from . import signup, prompt, vote, hibernate
+    return {
+        TwowState.REGISTERING: signup.SignUpView,
+        TwowState.RESPONDING: prompt.SubmissionView,
+        TwowState.VOTING: vote.VotingView,
+        TwowState.IDLE: EmptyView,
+        TwowState.HIBERNATING: hibernate.HibernationView,
+    }
+
+
+async def close():
+    if 'hibernate' in globals():
+        await hibernate.notifications.close()  # post submissions still waiting for a digest
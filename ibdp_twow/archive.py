@@ -0,0 +1,221 @@
+import asyncio
+import os
+import shutil
+from datetime import timezone
+
+import numpy as np
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+from db import Integer, String, Float, Boolean, DateTime
+from .tables import Participant, Response, Vote, live
+
+
+ARCHIVE_DIR = 'archives'
+TABLES = [Participant, Response, Vote]  # restore order (votes reference responses)
+NO_STRING = -1
+NO_INTEGER = np.iinfo(np.int64).min
+NO_BOOLEAN = -1
+
+
+def path(twow_id: int):
+    return os.path.join(ARCHIVE_DIR, f'twow_{twow_id}')
+
+
+def exists(twow_id: int):
+    return os.path.isdir(path(twow_id))
+
+
+class StringTable:
+    """
+    Interns strings while building an archive.
+    """
+
+    def __init__(self):
+        self.index: dict[str, int] = {}
+
+    def intern(self, value):
+        if value is None:
+            return NO_STRING
+        return self.index.setdefault(value, len(self.index))
+
+    def arrays(self):
+        encoded = [value.encode() for value in self.index]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return blob, offsets
+
+
+class Season:
+    """
+    Read-only view of an archived season. Each column is a separate `.npy` file and is memory-mapped on load.
+    String columns hold indices into an interned string table (a UTF-8 blob plus offsets).
+    """
+
+    def __init__(self, twow_id: int):
+        self.twow_id = twow_id
+        self.path = path(twow_id)
+        self._blob = np.load(os.path.join(self.path, 'strings.blob.npy'), mmap_mode='r')
+        self._offsets = np.load(os.path.join(self.path, 'strings.offsets.npy'), mmap_mode='r')
+
+    def __repr__(self):
+        return f'Season(twow_id={self.twow_id}, strings={len(self._offsets) - 1})'
+
+    def table(self, cls):
+        """
+        Columns of an archived table as a dict of memory-mapped arrays.
+        """
+        prefix = f'{cls.__tablename__}.'
+        columns = {}
+        for filename in os.listdir(self.path):
+            if filename.startswith(prefix):
+                name = filename[len(prefix):-len('.npy')]
+                columns[name] = np.load(os.path.join(self.path, filename), mmap_mode='r')
+        return columns
+
+    def string(self, index: int):
+        if index == NO_STRING:
+            return None
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return bytes(self._blob[start:end]).decode()
+
+    def strings(self, indices):
+        return [self.string(index) for index in indices]
+
+
+def _column_array(column, values, strings: StringTable):
+    if isinstance(column.type, String):
+        return np.array([strings.intern(value) for value in values], dtype=np.int32)
+    if isinstance(column.type, Boolean):
+        return np.array([NO_BOOLEAN if value is None else value for value in values], dtype=np.int8)
+    if isinstance(column.type, Float):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    if isinstance(column.type, Integer) or column.foreign_keys:
+        return np.array([NO_INTEGER if value is None else value for value in values], dtype=np.int64)
+    if isinstance(column.type, DateTime):
+        # stored as naive UTC, like SQLite does
+        return np.array([
+            np.datetime64('NaT') if value is None else np.datetime64(value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value, 'us')
+            for value in values
+        ], dtype='datetime64[us]')
+    raise TypeError(f'Cannot archive column {column} of type {column.type}.')
+
+
+def _column_values(array, season: Season):
+    if array.dtype == np.int32:
+        return season.strings(array)
+    if array.dtype == np.int8:
+        return [None if value == NO_BOOLEAN else bool(value) for value in array]
+    if array.dtype == np.float64:
+        return [None if np.isnan(value) else float(value) for value in array]
+    if array.dtype.kind == 'M':
+        return [None if np.isnat(value) else value.item() for value in array]
+    return [None if value == NO_INTEGER else int(value) for value in array]
+
+
+def _write(twow_id: int, tables: dict, strings: StringTable):
+    final = path(twow_id)
+    partial = final + '.partial'
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    for tablename, columns in tables.items():
+        for name, array in columns.items():
+            np.save(os.path.join(partial, f'{tablename}.{name}.npy'), array)
+    blob, offsets = strings.arrays()
+    np.save(os.path.join(partial, 'strings.blob.npy'), blob)
+    np.save(os.path.join(partial, 'strings.offsets.npy'), offsets)
+
+    os.replace(partial, final)
+
+
+async def dump(twow_id: int):
+    """
+    Move a season's participants, responses and votes out of the live tables into an archive.
+    """
+    if exists(twow_id):
+        raise FileExistsError(f'TWOW {twow_id} is already archived.')
+
+    strings = StringTable()
+    tables = {}
+    counts = {}
+    async with db.session() as session:
+        for cls in TABLES:
+            columns = list(cls.__table__.columns)
+            stmt = db.select(*columns).where(cls.twow_id == twow_id, *live(cls)).order_by(cls.id)  # soft-deleted rows are dropped
+            rows = (await session.execute(stmt)).all()
+            tables[cls.__tablename__] = {
+                column.name: _column_array(column, [row[i] for row in rows], strings)
+                for i, column in enumerate(columns)
+            }
+            counts[cls.__tablename__] = len(rows)
+
+    await asyncio.to_thread(_write, twow_id, tables, strings)
+
+    async with db.session() as session, session.begin():
+        for cls in reversed(TABLES):
+            await session.execute(db.delete(cls).where(cls.twow_id == twow_id))
+
+    logger.info(f'Archived TWOW {twow_id} to {path(twow_id)}: {counts}')
+    return counts
+
+
+def load(twow_id: int):
+    """
+    Open an archived season for reading.
+    """
+    if not exists(twow_id):
+        raise FileNotFoundError(f'TWOW {twow_id} is not archived.')
+    return Season(twow_id)
+
+
+async def restore(twow_id: int):
+    """
+    Move an archived season back into the live tables.
+    Rows get new ids (SQLite hands the archived ones out again once they are the highest), and references between
+    the archived tables are remapped to them. Votes for responses that were deleted before archiving are dropped.
+    """
+    season = load(twow_id)
+
+    counts = {}
+    restored_ids: dict[str, dict[int, int]] = {}  # table name -> archived id -> new id
+    async with db.session() as session, session.begin():
+        for cls in TABLES:
+            table = cls.__table__
+            columns = season.table(cls)
+            names = [name for name in columns if name in table.columns and name != 'id']
+            values = [_column_values(columns[name], season) for name in names]
+            archived_ids = [int(value) for value in columns['id']]
+            rows = [dict(zip(names, row)) for row in zip(*values)]
+
+            references = {
+                column.name: restored_ids[key.column.table.name]
+                for column in table.columns for key in column.foreign_keys if key.column.table.name in restored_ids
+            }
+            kept = [
+                (archived_id, row) for archived_id, row in zip(archived_ids, rows)
+                if all(row[name] is None or row[name] in ids for name, ids in references.items())
+            ]
+            if len(kept) < len(rows):
+                logger.warning(f'Dropped {len(rows) - len(kept)} row(s) of {table.name} referencing rows that were not archived.')
+            for _, row in kept:
+                for name, ids in references.items():
+                    if row[name] is not None:
+                        row[name] = ids[row[name]]
+
+            new_ids = []
+            if kept:
+                stmt = db.insert(table).returning(table.c.id, sort_by_parameter_order=True)
+                new_ids = (await session.scalars(stmt, [row for _, row in kept])).all()
+            restored_ids[table.name] = dict(zip([archived_id for archived_id, _ in kept], new_ids))
+            counts[table.name] = len(kept)
+
+    del season
+    await asyncio.to_thread(shutil.rmtree, path(twow_id))
+    logger.info(f'Restored TWOW {twow_id} from archive: {counts}')
+    return counts
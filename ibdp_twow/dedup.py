@@ -0,0 +1,99 @@
+from collections import defaultdict
+
+import discord
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+from db import Twow
+from .tables import Response
+from . import host
+
+from utils import minhash
+from utils.misc import chunked
+
+
+SIMILARITY_THRESHOLD = 0.7  # estimated Jaccard similarity of word shingles above which responses are near-duplicates
+
+
+class _Clusters:
+    """
+    Union-find over response indices.
+    """
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        self.parent[self.find(i)] = self.find(j)
+
+    def groups(self):
+        groups = defaultdict(list)
+        for i in range(len(self.parent)):
+            groups[self.find(i)].append(i)
+        return [group for group in groups.values() if len(group) > 1]
+
+
+def find_clusters(responses: list[Response]):
+    """
+    Clusters of identical (same normalized content hash) or near-identical responses.
+    Near-duplicates are only compared within shared LSH buckets, so this stays sub-quadratic.
+    """
+    clusters = _Clusters(len(responses))
+
+    by_hash = {}
+    for i, response in enumerate(responses):
+        if response.content_hash in by_hash:
+            clusters.union(i, by_hash[response.content_hash])
+        else:
+            by_hash[response.content_hash] = i
+
+    signatures = [minhash.signature(minhash.shingles(response.content)) for response in responses]
+    buckets = defaultdict(list)
+    for i, signature in enumerate(signatures):
+        for band, bucket in enumerate(minhash.bands(signature)):
+            buckets[band, bucket].append(i)
+
+    for members in buckets.values():
+        for k, i in enumerate(members):
+            for j in members[k + 1:]:
+                if clusters.find(i) != clusters.find(j) and minhash.similarity(signatures[i], signatures[j]) >= SIMILARITY_THRESHOLD:
+                    clusters.union(i, j)
+
+    return [[responses[i] for i in group] for group in clusters.groups()]
+
+
+async def report(twow: Twow, channel: discord.TextChannel):
+    """
+    Flag duplicate responses of the current round in the host thread. Returns the clusters found.
+    """
+    async with db.session() as session:
+        stmt = db.select(Response).where(
+            Response.twow_id == twow.id,
+            Response.round == twow.current_round,
+            Response.content.is_not(None),
+            Response.deleted.is_(False)
+        ).order_by(Response.id)
+        responses = (await session.scalars(stmt)).all()
+
+    clusters = find_clusters(responses)
+    logger.info(f'Found {len(clusters)} duplicate cluster(s) among {len(responses)} responses of TWOW {twow.id} round {twow.current_round}.')
+    if not clusters:
+        return clusters
+
+    lines = [f'**Possible duplicate responses in round {twow.current_round}** (voting is opening now):']
+    for number, cluster in enumerate(clusters, start=1):
+        lines.append(f'{number}. ' + ', '.join(f'`{response.content}` (<@{response.user_id}>)' for response in cluster))
+    thread = await host.threads.get(twow.id, channel)
+    for chunk in chunked(lines):
+        await thread.send(chunk, allowed_mentions=discord.AllowedMentions.none())
+    return clusters
@@ -1,4 +1,4 @@
-from typing import Optional, Coroutine
+from typing import Optional, Coroutine, NamedTuple
 
 import discord
 
@@ -8,10 +8,36 @@ logger = logging.getLogger(__name__)
 
 # project imports
 import db
-from db import Prompt, Twow, TwowChannel
+import pool
+from db import Twow, TwowState
 from .tables import Participant, Response
+from . import host
 
-from utils.views import ConfirmationView, EmptyView
+from utils.views import TwowView, ConfirmationView, EmptyView, current
+from utils.digest import Digest
+from utils.misc import chunked
+
+
+NOTIFICATION_INTERVAL = 60.  # seconds between digests posted in a host thread
+NOTIFICATION_BATCH = 15  # submissions that trigger a digest early
+
+
+class Notification(NamedTuple):
+    channel: discord.TextChannel  # TWOW channel the submission came from
+    text: str
+
+
+async def post_digest(twow_id: int, notifications: list[Notification]):
+    """
+    Post a batch of submissions into the host thread of a TWOW.
+    """
+    private_channel = await host.threads.get(twow_id, notifications[-1].channel)
+    lines = [f'**{len(notifications)} new submission(s):**'] + [notification.text for notification in notifications]
+    for chunk in chunked(lines):
+        await private_channel.send(chunk)
+
+
+notifications = Digest(post_digest, interval=NOTIFICATION_INTERVAL, max_items=NOTIFICATION_BATCH)
 
 
 class PromptSubmissionModal(discord.ui.Modal, title='Suggesting a Prompt'):
@@ -29,24 +55,18 @@ class PromptSubmissionModal(discord.ui.Modal, title='Suggesting a Prompt'):
         super().__init__()
         self.twow = twow
 
+    async def interaction_check(self, interaction: discord.Interaction):
+        self.twow = await current(interaction, self.twow, TwowState.HIBERNATING)  # the canonical state at submission time
+        return self.twow is not None
+
     async def on_submit(self, interaction: discord.Interaction):
-        prompt = Prompt(
-            user_id = interaction.user.id,
-            content = self.prompt_input.value
-        )
-        async with db.session() as session, session.begin():
-            session.add(prompt)
-
-        if not self.twow.private_channel_id:
-            private_channel = await interaction.channel.create_thread(name=f"TWOW Host Thread ({self.twow.id})")
-            async with db.session() as session, session.begin():
-                session.add(self.twow)
-                self.twow.private_channel_id = private_channel.id
-        else:
-            private_channel = interaction.guild.get_channel_or_thread(self.twow.private_channel_id)
-        await private_channel.send(f'Prompt submitted by {interaction.user.mention}: "{prompt.content}"')
+        prompt, duplicate = await pool.add(interaction.user.id, interaction.guild_id, self.prompt_input.value)
+        if duplicate is not None:
+            await interaction.response.send_message(f"""A very similar prompt has already been suggested! ```{duplicate.content}```""", ephemeral=True)
+            return
 
         await interaction.response.send_message(f"""Thank you! ```Prompt submitted: "{prompt.content}"```""", ephemeral=True)
+        notifications.add(self.twow.id, Notification(interaction.channel, f'- Prompt by {interaction.user.mention}: "{prompt.content}"'))
 
 
 class FeedbackModal(discord.ui.Modal, title='Feedback'):
@@ -63,28 +83,18 @@ class FeedbackModal(discord.ui.Modal, title='Feedback'):
         super().__init__()
         self.twow = twow
 
-    async def on_submit(self, interaction: discord.Interaction):
-        if not self.twow.private_channel_id:
-            private_channel = await interaction.channel.create_thread(f"TWOW Host Thread ({self.twow.id})")
-            async with db.session() as session, session.begin():
-                session.add(self.twow)
-                self.twow.private_channel_id = private_channel.id
-
-                host_id = await session.get(TwowChannel, self.twow.channel_id).host_id
-            if host_id:
-                await private_channel.send(f'<@&{host_id}>')
-        else:
-            private_channel = interaction.guild.get_channel_or_thread(self.twow.private_channel_id)
-        await private_channel.send(f'Feedback submitted by {interaction.user.mention}: "{self.feedback_input.value}"')
+    async def interaction_check(self, interaction: discord.Interaction):
+        self.twow = await current(interaction, self.twow, TwowState.HIBERNATING)  # the canonical state at submission time
+        return self.twow is not None
 
+    async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.send_message(f"""Thank you! ```Feedback submitted: "{self.feedback_input.value}"```""", ephemeral=True)
+        notifications.add(self.twow.id, Notification(interaction.channel, f'- Feedback by {interaction.user.mention}: "{self.feedback_input.value}"'))
 
 
-class HibernationView(discord.ui.View):
+class HibernationView(TwowView):
 
-    def __init__(self, twow: Twow):
-        super().__init__(timeout=None)
-        self.twow = twow
+    state = TwowState.HIBERNATING
 
     @discord.ui.button(
         label = 'Submit your own prompts!',
@@ -93,7 +103,8 @@ class HibernationView(discord.ui.View):
         custom_id = 'hibernation:promptsubmission',
     )
     async def submit_prompt(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = PromptSubmissionModal(self.twow)
+        twow = self.resolve(interaction)
+        modal = PromptSubmissionModal(twow)
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(
@@ -103,5 +114,6 @@ class HibernationView(discord.ui.View):
         custom_id = 'hibernation:feedback',
     )
     async def give_feedback(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = FeedbackModal(self.twow)
+        twow = self.resolve(interaction)
+        modal = FeedbackModal(twow)
         await interaction.response.send_modal(modal)
@@ -0,0 +1,69 @@
+import asyncio
+
+import discord
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+import registry
+from db import Twow, TwowChannel
+
+
+class HostThreads:
+    """
+    Resolves the private host thread of each TWOW, creating it at most once.
+    Resolved threads are cached, so later posts do not need any database or API lookups.
+    """
+
+    def __init__(self):
+        self._threads: dict[int, discord.Thread] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    async def get(self, twow_id: int, channel: discord.TextChannel):
+        """
+        Host thread of a TWOW, created under its TWOW channel if it does not exist yet.
+        """
+        thread = self._threads.get(twow_id)
+        if thread is not None:
+            return thread
+
+        async with self._locks.setdefault(twow_id, asyncio.Lock()):
+            thread = self._threads.get(twow_id)
+            if thread is not None:
+                return thread  # created while waiting for the lock
+
+            # usually the thread exists already, so this is only a read (no state lock held across API calls)
+            twow = await db.fetch_by_id(Twow, twow_id)
+            if twow.private_channel_id:
+                thread = await self._fetch(channel.guild, twow.private_channel_id)
+            if thread is None:
+                thread = await channel.create_thread(name=f'TWOW Host Thread ({twow_id})')
+                twow_channel = await db.fetch_by_id(TwowChannel, twow.channel_id)
+                if twow_channel.host_id:
+                    await thread.send(f'<@&{twow_channel.host_id}>')
+                async with registry.twows.write(channel.id, twow_id, versioned=False) as (session, twow):
+                    twow.private_channel_id = thread.id
+                logger.info(f'Created host thread {thread.id} for TWOW {twow_id}.')
+
+            self._threads[twow_id] = thread
+        return thread
+
+    async def _fetch(self, guild: discord.Guild, thread_id: int):
+        thread = guild.get_channel_or_thread(thread_id)
+        if thread is not None:
+            return thread
+        try:
+            return await guild.fetch_channel(thread_id)  # archived threads are not cached
+        except discord.NotFound:
+            logger.warning(f'Host thread {thread_id} no longer exists, creating a new one.')
+            return None
+
+    def discard(self, twow_id: int):
+        self._threads.pop(twow_id, None)
+        self._locks.pop(twow_id, None)
+
+
+threads = HostThreads()
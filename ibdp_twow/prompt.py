@@ -8,10 +8,17 @@ logger = logging.getLogger(__name__)
 
 # project imports
 import db
-from db import Twow
+from db import Twow, TwowState
 from .tables import Participant, Response
+from . import vote
 
-from utils.views import ConfirmationView, EmptyView
+from utils.views import TwowView, ConfirmationView, EmptyView, current, reply
+from utils.admission import admission, Overloaded
+from utils.coalesce import Coalescer
+from utils import text
+
+
+BUSY_MESSAGE = 'Lots of people are submitting right now! Please try again in a few seconds.'
 
 
 class SubmissionModal(discord.ui.Modal, title='Sign Up'):
@@ -24,33 +31,52 @@ class SubmissionModal(discord.ui.Modal, title='Sign Up'):
         max_length=100
     )
 
-    def __init__(self, twow: Twow, participant: Participant = None, response: Optional[Response] = None):
+    def __init__(self, twow: Twow, participant: Participant, response: Optional[Response] = None):
         super().__init__()
 
         self.children[0].placeholder = response.content if response else 'Write your 10-word response here!'
 
         self.twow = twow
         self.participant = participant
-        self.response = response or Response(
-            twow_id = twow.id,
-            user_id = participant.user_id,
-            round = twow.current_round
-        )
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        self.twow = await current(interaction, self.twow, TwowState.RESPONDING)  # the canonical state at submission time
+        return self.twow is not None
 
     async def on_submit(self, interaction: discord.Interaction):
+        content = text.normalize(self.response_input.value)
+        problem = Response.validate(content)
+        if problem:
+            await interaction.response.send_message(f"""🚫 {problem} ```{content.content}```""", ephemeral=True)
+            return
+
         name = self.participant.moniker or interaction.user.name
-        async with db.session() as session, session.begin():
-            session.add(self.response)
-            self.response.content = self.response_input.value.replace('\n', ' ')
+        key = (self.twow.id, self.twow.current_round, interaction.user.id)
+        try:
+            async with admission.admit(self.twow.id, defer=lambda: interaction.response.defer(ephemeral=True, thinking=True)):
+                response = await submissions.submit(key, content)
+        except Overloaded:
+            await reply(interaction, BUSY_MESSAGE, ephemeral=True)
+            return
 
-        await interaction.response.send_message(f"""Response recorded! ```{name}: "{self.response.content}"```""", ephemeral=True)
+        await reply(interaction, f"""Response recorded! ```{name}: "{response.content}"```""", ephemeral=True)
 
 
-class SubmissionView(discord.ui.View):
+async def write_submission(key, content):
+    """
+    Store a (coalesced) response as a single upsert.
+    """
+    twow_id, twow_round, user_id = key
+    async with db.session() as session, session.begin():
+        response = await Response.upsert(session, twow_id=twow_id, twow_round=twow_round, user_id=user_id, content=content)
+    return response
+
+submissions = Coalescer(write_submission)
 
-    def __init__(self, twow):
-        super().__init__(timeout=None)
-        self.twow = twow
+
+class SubmissionView(TwowView):
+
+    state = TwowState.RESPONDING
 
     @discord.ui.button(
         label = 'Submit your response here!',
@@ -59,18 +85,26 @@ class SubmissionView(discord.ui.View):
         custom_id = 'prompt:respond',
     )
     async def submit_response(self, interaction: discord.Interaction, button: discord.ui.Button):
-        participant = await Participant.fetch_by_user(twow_id=self.twow.id, user_id=interaction.user.id)
+        twow = self.resolve(interaction)
+        # a modal has to be the first response, so this interaction cannot be deferred (it is shed rather than queued)
+        try:
+            async with admission.admit(twow.id):
+                participant = await Participant.fetch_by_user(twow_id=twow.id, user_id=interaction.user.id)
+                response = await Response.fetch_by_round_and_user(twow_id=twow.id, twow_round=twow.current_round, user_id=interaction.user.id)
+        except Overloaded:
+            await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True)
+            return
+
         if not participant:
             await interaction.response.send_message('You are not signed up to participate in this TWOW season! Make sure to sign up next season.', ephemeral=True)
             return
 
-        response = await Response.fetch_by_round_and_user(twow_id=self.twow.id, twow_round=self.twow.current_round, user_id=interaction.user.id)
         if not response:
-            modal = SubmissionModal(self.twow, participant=participant)
+            modal = SubmissionModal(twow, participant=participant)
             await interaction.response.send_modal(modal)
             return
 
-        modal = SubmissionModal(self.twow, participant=participant, response=response)
+        modal = SubmissionModal(twow, participant=participant, response=response)
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(
@@ -80,12 +114,13 @@ class SubmissionView(discord.ui.View):
         custom_id = 'prompt:view'
     )
     async def view_response(self, interaction: discord.Interaction, button: discord.ui.Button):
-        participant = await Participant.fetch_by_user(twow_id=self.twow.id, user_id=interaction.user.id)
+        twow = self.resolve(interaction)
+        participant = await Participant.fetch_by_user(twow_id=twow.id, user_id=interaction.user.id)
         if not participant:
             await interaction.response.send_message('You are not signed up to participate in this TWOW season! Make sure to sign up next season.', ephemeral=True)
             return
 
-        response = await Response.fetch_by_round_and_user(twow_id=self.twow.id, twow_round=self.twow.current_round, user_id=interaction.user.id)
+        response = await Response.fetch_by_round_and_user(twow_id=twow.id, twow_round=twow.current_round, user_id=interaction.user.id)
         if not response:
             await interaction.response.send_message('You have not submitted a response! Click the green button to submit a response.', ephemeral=True)
             return
@@ -100,19 +135,25 @@ class SubmissionView(discord.ui.View):
         custom_id = 'prompt:delete'
     )
     async def delete_response(self, interaction: discord.Interaction, button: discord.ui.Button):
-        participant = await Participant.fetch_by_user(twow_id=self.twow.id, user_id=interaction.user.id)
+        twow = self.resolve(interaction)
+        participant = await Participant.fetch_by_user(twow_id=twow.id, user_id=interaction.user.id)
         if not participant:
             content = f'You are not signed up to participate in this TWOW season! Make sure to sign up next season.'
             await interaction.response.send_message(content, ephemeral=True)
             return
 
-        response = await Response.fetch_by_round_and_user(twow_id=self.twow.id, twow_round=self.twow.current_round, user_id=interaction.user.id)
+        response = await Response.fetch_by_round_and_user(twow_id=twow.id, twow_round=twow.current_round, user_id=interaction.user.id)
+        if not response:
+            await interaction.response.send_message('You have not submitted a response! Click the green button to submit a response.', ephemeral=True)
+            return
 
         content = f'Are you sure? You will not score any points this round unless you submit a response!'
         async def yes(interaction: discord.Interaction):
             async with db.session() as session, session.begin():
-                await session.delete(response)
-            await interaction.response.edit_message(content='Response deleted.', view=EmptyView(self.twow))
+                # soft-deleted here, purged by the compactor
+                await session.execute(db.update(Response).where(Response.id == response.id).values(deleted=True))
+            vote.drop_prefetched(twow.id)  # prefetched ballots may show the deleted response
+            await interaction.response.edit_message(content='Response deleted.', view=EmptyView(twow))
         async def no(interaction: discord.Interaction):
-            await interaction.response.edit_message(content='Response preserved.', view=EmptyView(self.twow))
+            await interaction.response.edit_message(content='Response preserved.', view=EmptyView(twow))
         await interaction.response.send_message(content, view=ConfirmationView(yes, no), ephemeral=True)
\ No newline at end of file
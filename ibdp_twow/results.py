@@ -10,84 +10,156 @@ logger = logging.getLogger(__name__)
 import db
 from db import Twow
 from .tables import Participant, Response, Vote
+from . import tally
 
 from utils.misc import clumped
+from utils.scoring import ScoreBands, band_scores
+from utils.vote_quality import voter_stats
 
 
-async def update(twow: Twow):
-    async with db.session() as session, session.begin():
+# IB scoring: rounds are graded like subjects (1-7), round 7 like the core (0-3), for a maximum of 45 points
+SUBJECT_BANDS = ScoreBands.equal(range(1, 8))
+CORE_BANDS = ScoreBands.equal(range(0, 4))
+SCORE_BANDS = {7: CORE_BANDS}
 
-    # update ratings
-        stmt = db.select(Participant).where(
-            Participant.twow_id == twow.id
-        )
-        participants = (await session.scalars(stmt)).all()
 
-        stmt = db.select(Response).where(
-            Response.twow_id == twow.id,
-            Response.round == twow.current_round
-        )
-        responses = (await session.scalars(stmt)).all()
+_scored: dict[tuple[int, int], tuple[int, bool]] = {}  # (twow id, round) -> (tally version, weighted) the stored scores were computed from
 
-        stmt = db.select(Vote).where(
+
+def score_bands(twow_round: int):
+    return SCORE_BANDS.get(twow_round, SUBJECT_BANDS)
+
+
+async def voter_quality(twow: Twow):
+    """
+    Per-voter statistics for the current round (see utils/vote_quality.py).
+    """
+    async with db.session() as session:
+        stmt = db.select(Vote.user_id, Vote.upvoted_id, Vote.downvoted_id, Vote.side, Vote.timestamp).where(
             Vote.twow_id == twow.id,
             Vote.round == twow.current_round
         )
-        votes = (await session.scalars(stmt)).all()
+        votes = (await session.execute(stmt)).all()
+
+    user_ids, upvoted_ids, downvoted_ids, sides, timestamps = zip(*votes) if votes else ([],) * 5
+    return voter_stats(
+        user_ids, upvoted_ids, downvoted_ids,
+        [-1 if side is None else side for side in sides],
+        [timestamp.timestamp() if timestamp else float('nan') for timestamp in timestamps]
+    )
+
+
+def replay(response_ids, participants, history, trust: dict[int, float] = None):
+    """
+    Ratings and vote counts from replaying every vote from the initial rating.
+    Each voter's votes are weighted by how often they saw each response, and by their trust if given.
+    """
+    ratings = {response_id: tally.INITIAL_RATING for response_id in response_ids}
+    upvotes, downvotes = Counter(), Counter()
+    for _, user_id in participants:
+        voted_response_ids = history.get(user_id, [])
+        c = Counter(sum(voted_response_ids, ()))
+        weight = trust.get(user_id, 1.) if trust else 1.
+        for upvoted_id, downvoted_id in voted_response_ids:
+            if upvoted_id not in ratings or downvoted_id not in ratings:
+                continue
+            expected_value = tally.expected_loss(ratings[upvoted_id], ratings[downvoted_id])
+            ratings[upvoted_id] += 50 * expected_value * weight / c[upvoted_id]
+            ratings[downvoted_id] -= 50 * expected_value * weight / c[downvoted_id]
+            upvotes[upvoted_id] += 1
+            downvotes[downvoted_id] += 1
+    return ratings, upvotes, downvotes
+
+
+async def update(twow: Twow, weighted: bool = True, force: bool = False):
+    """
+    Recompute ratings and scores for the current round, and every participant's total.
+    Ratings are replayed from scratch and totals are rebuilt from all rounds, so this can safely run again (/recalculate).
+    If `weighted`, votes from voters flagged by the vote-quality checks count for less.
+    Unless `force`d, nothing is recomputed while the tally is unchanged since the last update.
+    """
+    async with db.session() as session:
+        stmt = db.select(Participant.id, Participant.user_id).where(
+            Participant.twow_id == twow.id,
+            Participant.deleted.is_(False)
+        )
+        participants = (await session.execute(stmt)).all()
 
-    if not votes:
+        stmt = db.select(Response.id).where(
+            Response.twow_id == twow.id,
+            Response.round == twow.current_round,
+            Response.deleted.is_(False)
+        )
+        response_ids = (await session.scalars(stmt)).all()
+
+    # votes are seeded from the live tally rather than rescanning the Vote table
+    current = await tally.fetch(twow)
+    if not current.history:
+        return
+    if not force and _scored.get((twow.id, twow.current_round)) == (current.version, weighted):
+        logger.debug(f'{current} is unchanged since it was last scored.')
         return
 
-    responses = {response.id: response for response in responses}
-    for participant in participants:
-        voted_response_ids = [(vote.upvoted_id, vote.downvoted_id) for vote in votes if vote.user_id == participant.user_id]
-        c = Counter(sum(voted_response_ids, ()))
-        for upvoted_id, downvoted_id in voted_response_ids:
-            upvoted = responses[upvoted_id]
-            downvoted = responses[downvoted_id]
-            w1 = 1/c[upvoted_id]
-            w2 = 1/c[downvoted_id]
-            await Response.update_ratings(upvoted=upvoted, downvoted=downvoted, weights=(w1, w2))
+    # update ratings
+    trust = None
+    if weighted:
+        quality = await voter_quality(twow)
+        for user_id, reasons in quality.flagged().items():
+            logger.info(f'Voter {user_id} in TWOW {twow.id} round {twow.current_round} flagged as {", ".join(reasons)}.')
+        trust = quality.weights()
+    ratings, upvotes, downvotes = replay(response_ids, participants, current.history, trust)
 
     # update scores
-    QUANTILE = 6 if twow.current_round != 7 else 3
-    NO_SCORE = 1 if twow.current_round != 7 else 0
+    scores = band_scores([ratings[response_id] for response_id in response_ids], score_bands(twow.current_round))
     async with db.session() as session, session.begin():
-        stmt = db.select(Participant).where(
-            Participant.twow_id == twow.id
-        )
-        participants = (await session.scalars(stmt)).all()
-
-        stmt = db.select(Response).where(
+        if response_ids:
+            await session.execute(db.update(Response), [
+                dict(id=response_id, rating=ratings[response_id], upvotes=upvotes[response_id], downvotes=downvotes[response_id], score=int(score))
+                for response_id, score in zip(response_ids, scores)
+            ])
+
+        # totals over every graded round (sign-up round 0 is not graded); a missed round counts as its lowest score
+        stmt = db.select(Response.user_id, Response.round, Response.score).where(
             Response.twow_id == twow.id,
-            Response.round == twow.current_round
+            Response.round > 0,
+            Response.round <= twow.current_round,
+            Response.score.is_not(None),
+            Response.deleted.is_(False)
         )
-        responses = (await session.scalars(stmt)).all()
+        round_scores = defaultdict(dict)
+        for user_id, twow_round, score in (await session.execute(stmt)).all():
+            round_scores[user_id][twow_round] = score
+        graded_rounds = {twow_round for scored in round_scores.values() for twow_round in scored}
+
+        if participants:
+            await session.execute(db.update(Participant), [
+                dict(id=participant_id, score=sum(round_scores[user_id].get(r, score_bands(r).minimum) for r in graded_rounds))
+                for participant_id, user_id in participants
+            ])
 
-        session.add_all(responses)
-        step = len(responses)//QUANTILE  # ib scoring system
-        round_score = defaultdict(lambda: NO_SCORE)
-        for i, response in enumerate(sorted(responses, key=lambda r: r.rating)):
-            score = NO_SCORE + (i//step if step else 0)
-            response.score = score
-            round_score[response.user_id] = score
+    _scored[twow.id, twow.current_round] = (current.version, weighted)
 
-        if twow.current_round > 0:
-            session.add_all(participants)
-            for participant in participants:
-                participant.score += round_score[participant.user_id]
+
+async def standings(twow: Twow):
+    """
+    Provisional standings for a round, straight from the live tally.
+    """
+    current = await tally.fetch(twow)
+    return current.standings()
 
 
 async def display(twow: Twow, thread: discord.Thread):
     async with db.session() as session:
         stmt = db.select(Participant).where(
-            Participant.twow_id == twow.id
+            Participant.twow_id == twow.id,
+            Participant.deleted.is_(False)
         )
         participants = (await session.scalars(stmt)).all()
 
         stmt = db.select(Response).where(
             Response.twow_id == twow.id,
-            Response.round == twow.current_round
+            Response.round == twow.current_round,
+            Response.deleted.is_(False)
         )
         responses = (await session.scalars(stmt)).all()
 
@@ -105,13 +177,17 @@ async def display(twow: Twow, thread: discord.Thread):
                 logger.warning(f'Fetching member with ID {participant.user_id} failed.')
                 return 'HTTP Exception occurred.'
 
+    # responses of removed participants are left out
+    by_user = {participant.user_id: participant for participant in participants}
+    responses = [response for response in responses if response.user_id in by_user]
+
     PAGE_SIZE = 10
     for clump in clumped(enumerate(sorted(responses, key=lambda r: r.rating, reverse=True), start=1), n=PAGE_SIZE):
         embed = discord.Embed()
         for rank, response in clump:
-            participant ,= [p for p in participants if p.user_id == response.user_id]
+            participant = by_user[response.user_id]
             embed.add_field(
-                name = f"{rank}. {response.content} ({len(response.content.split())} words)",
+                name = f"{rank}. {response.content} ({response.word_count} words)",
                 value = f"{round(response.rating)} ELO ({response.upvotes}/{response.downvotes}) - by **{participant.moniker}**, {response.score} points ({participant.score} total)",
                 inline = False
             )
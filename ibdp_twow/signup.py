@@ -8,10 +8,13 @@ logger = logging.getLogger(__name__)
 
 # project imports
 import db
-from db import Twow
+from db import Twow, TwowState
 from .tables import Participant, Response
+from . import vote
 
-from utils.views import ConfirmationView, EmptyView
+from utils.views import TwowView, ConfirmationView, EmptyView, current
+from utils.coalesce import Coalescer, merge_non_null
+from utils import text
 
 
 class SignUpModal(discord.ui.Modal, title='Sign Up'):
@@ -34,9 +37,7 @@ class SignUpModal(discord.ui.Modal, title='Sign Up'):
         max_length=100
     )
 
-    def __init__(self, twow: Twow, participant: Optional[Participant] = None, response: Optional[Response] = None, user: Optional[discord.User] = None):
-        if bool(participant) == bool(user):
-            raise ValueError('Must supply one of "participant" or "user" (not both!) to sign-up modal initialization.')
+    def __init__(self, twow: Twow, participant: Optional[Participant] = None, response: Optional[Response] = None):
         super().__init__()
 
         if participant and participant.moniker:
@@ -46,34 +47,43 @@ class SignUpModal(discord.ui.Modal, title='Sign Up'):
             self.children[1].required = False
 
         self.twow = twow
-        self.participant = participant or Participant(
-            twow_id = twow.id,
-            user_id = user.id
-        )
-        self.response = response or Response(
-            twow_id = twow.id,
-            user_id = user.id,
-            round = twow.current_round
-        )
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        self.twow = await current(interaction, self.twow, TwowState.REGISTERING)  # the canonical state at submission time
+        return self.twow is not None
 
     async def on_submit(self, interaction: discord.Interaction):
-        async with db.session() as session, session.begin():
-            session.add(self.participant)
-            if self.moniker_input.value:
-                self.participant.moniker = self.moniker_input.value.replace('\n', ' ')
+        content = text.normalize(self.response_input.value) if text.clean(self.response_input.value) else None
+        problem = content and Response.validate(content)
+        if problem:
+            await interaction.response.send_message(f"""🚫 {problem} ```{content.content}```""", ephemeral=True)
+            return
 
-            session.add(self.response)
-            if self.response_input.value:
-                self.response.content = self.response_input.value.replace('\n', ' ')
+        key = (self.twow.id, self.twow.current_round, interaction.user.id)
+        participant, response = await submissions.submit(key, dict(
+            moniker = text.clean(self.moniker_input.value) or None,
+            content = content
+        ))
 
-        await interaction.response.send_message(f"""Response recorded! ```{self.participant.moniker}: "{self.response.content}"```""", ephemeral=True)
+        await interaction.response.send_message(f"""Response recorded! ```{participant.moniker}: "{response.content}"```""", ephemeral=True)
 
 
-class SignUpView(discord.ui.View):
+async def write_submission(key, value):
+    """
+    Store a (coalesced) sign-up as two upserts in one transaction.
+    """
+    twow_id, twow_round, user_id = key
+    async with db.session() as session, session.begin():
+        participant = await Participant.upsert(session, twow_id=twow_id, user_id=user_id, moniker=value['moniker'])
+        response = await Response.upsert(session, twow_id=twow_id, twow_round=twow_round, user_id=user_id, content=value['content'])
+    return participant, response
 
-    def __init__(self, twow: Twow):
-        super().__init__(timeout=None)
-        self.twow = twow
+submissions = Coalescer(write_submission, merge=merge_non_null)
+
+
+class SignUpView(TwowView):
+
+    state = TwowState.REGISTERING
 
     @discord.ui.button(
         label = 'Sign up for TWOW here.',
@@ -82,20 +92,21 @@ class SignUpView(discord.ui.View):
         custom_id = 'signup:register',
     )
     async def register(self, interaction: discord.Interaction, button: discord.ui.Button):
-        participant = await Participant.fetch_by_user(twow_id=self.twow.id, user_id=interaction.user.id)
+        twow = self.resolve(interaction)
+        participant = await Participant.fetch_by_user(twow_id=twow.id, user_id=interaction.user.id)
         if not participant:
-            modal = SignUpModal(self.twow, user=interaction.user)
+            modal = SignUpModal(twow)
             await interaction.response.send_modal(modal)
             logger.info('No participant record, modal sent.')
             return
 
-        response = await Response.fetch_by_round_and_user(twow_id=self.twow.id, twow_round=self.twow.current_round, user_id=interaction.user.id)
+        response = await Response.fetch_by_round_and_user(twow_id=twow.id, twow_round=twow.current_round, user_id=interaction.user.id)
         if not response:
-            modal = SignUpModal(self.twow, participant=participant)
+            modal = SignUpModal(twow, participant=participant)
             await interaction.response.send_modal(modal)
             return
 
-        modal = SignUpModal(self.twow, participant=participant, response=response)
+        modal = SignUpModal(twow, participant=participant, response=response)
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(
@@ -105,12 +116,13 @@ class SignUpView(discord.ui.View):
         custom_id = 'signup:view_response'
     )
     async def view_response(self, interaction: discord.Interaction, button: discord.ui.Button):
-        participant = await Participant.fetch_by_user(twow_id=self.twow.id, user_id=interaction.user.id)
+        twow = self.resolve(interaction)
+        participant = await Participant.fetch_by_user(twow_id=twow.id, user_id=interaction.user.id)
         if not participant:
             await interaction.response.send_message('You are not signed up! Click the green button to submit (an optional moniker and) a response.', ephemeral=True)
             return
 
-        response = await Response.fetch_by_round_and_user(twow_id=self.twow.id, twow_round=self.twow.current_round, user_id=interaction.user.id)
+        response = await Response.fetch_by_round_and_user(twow_id=twow.id, twow_round=twow.current_round, user_id=interaction.user.id)
         if not response:
             await interaction.response.send_message('You are not signed up! Click the green button to submit a response.', ephemeral=True)
             return
@@ -125,7 +137,8 @@ class SignUpView(discord.ui.View):
         custom_id = 'signup:reset_moniker'
     )
     async def reset_moniker(self, interaction: discord.Interaction, button: discord.ui.Button):
-        participant = await Participant.fetch_by_user(twow_id=self.twow.id, user_id=interaction.user.id)
+        twow = self.resolve(interaction)
+        participant = await Participant.fetch_by_user(twow_id=twow.id, user_id=interaction.user.id)
         if not participant:
             content = f'You are not signed up! Click the green button to submit (an optional moniker and) a response.'
             await interaction.response.send_message(content, ephemeral=True)
@@ -140,9 +153,9 @@ class SignUpView(discord.ui.View):
             async with db.session() as session, session.begin():
                 session.add(participant)
                 participant.moniker = None
-            await interaction.response.edit_message(content='Moniker reset.', view=EmptyView(self.twow))
+            await interaction.response.edit_message(content='Moniker reset.', view=EmptyView(twow))
         async def no(interaction: discord.Interaction):
-            await interaction.response.edit_message(content='Moniker preserved.', view=EmptyView(self.twow))
+            await interaction.response.edit_message(content='Moniker preserved.', view=EmptyView(twow))
         await interaction.response.send_message(content, view=ConfirmationView(yes, no), ephemeral=True)
     
     @discord.ui.button(
@@ -152,20 +165,25 @@ class SignUpView(discord.ui.View):
         custom_id = 'signup:remove_user'
     )
     async def remove_user(self, interaction: discord.Interaction, button: discord.ui.Button):
-        participant = await Participant.fetch_by_user(twow_id=self.twow.id, user_id=interaction.user.id)
+        twow = self.resolve(interaction)
+        participant = await Participant.fetch_by_user(twow_id=twow.id, user_id=interaction.user.id)
         if not participant:
             content = f'You are not signed up! Click the green button to submit (an optional moniker and) a response.'
             await interaction.response.send_message(content, ephemeral=True)
             return
 
-        response = await Response.fetch_by_round_and_user(twow_id=self.twow.id, twow_round=self.twow.current_round, user_id=interaction.user.id)
+        response = await Response.fetch_by_round_and_user(twow_id=twow.id, twow_round=twow.current_round, user_id=interaction.user.id)
 
         content = f'Are you sure? You will not be able to participate for the entire TWOW season.'
         async def yes(interaction: discord.Interaction):
             async with db.session() as session, session.begin():
-                await session.delete(participant)
-                await session.delete(response)
-            await interaction.response.edit_message(content='You have been removed from this TWOW season.', view=EmptyView(self.twow))
+                # soft-deleted here, purged by the compactor
+                await session.execute(db.update(Participant).where(Participant.id == participant.id).values(deleted=True))
+                if response:
+                    await session.execute(db.update(Response).where(Response.id == response.id).values(deleted=True))
+            if response:
+                vote.drop_prefetched(twow.id)  # prefetched ballots may show the deleted response
+            await interaction.response.edit_message(content='You have been removed from this TWOW season.', view=EmptyView(twow))
         async def no(interaction: discord.Interaction):
-            await interaction.response.edit_message(content='Action cancelled.', view=EmptyView(self.twow))
+            await interaction.response.edit_message(content='Action cancelled.', view=EmptyView(twow))
         await interaction.response.send_message(content, view=ConfirmationView(yes, no), ephemeral=True)
@@ -0,0 +1,184 @@
+from typing import Optional
+
+import numpy as np
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+from db import Prompt, Twow
+from .tables import Participant, Response, Vote, UserStats, RoundStats, live
+from . import archive
+
+
+COLUMNS = {
+    Participant: ['user_id', 'score'],
+    Response: ['user_id', 'round', 'rating', 'upvotes', 'downvotes'],
+    Vote: ['user_id', 'round'],
+}
+MIN_VOTES = 10  # minimum exposure before a user shows up in the win rate leaderboard
+
+
+async def columns(twow_id: int):
+    """
+    Fetch the columns needed for statistics as numpy arrays, from the archive if the season is archived.
+    """
+    if archive.exists(twow_id):
+        season = archive.load(twow_id)
+        data = {}
+        for cls, names in COLUMNS.items():
+            table = season.table(cls)
+            data[cls] = {name: table[name] for name in names}
+        return data
+
+    data = {}
+    async with db.session() as session:
+        for cls, names in COLUMNS.items():
+            stmt = db.select(*(getattr(cls, name) for name in names)).where(cls.twow_id == twow_id, *live(cls))
+            rows = (await session.execute(stmt)).all()
+            data[cls] = {
+                name: np.fromiter((row[i] or 0 for row in rows), dtype=np.float64 if name == 'rating' else np.int64, count=len(rows))
+                for i, name in enumerate(names)
+            }
+    return data
+
+
+def user_summary(twow_id: int, participants: dict, responses: dict):
+    """
+    Per-user response counts, vote totals, rating totals and scores for one season.
+    """
+    users = np.union1d(participants['user_id'], responses['user_id'])
+    n = len(users)
+
+    index = np.searchsorted(users, responses['user_id'])
+    counts = np.bincount(index, minlength=n)
+    upvotes = np.bincount(index, weights=responses['upvotes'], minlength=n)
+    downvotes = np.bincount(index, weights=responses['downvotes'], minlength=n)
+    rating_total = np.bincount(index, weights=responses['rating'], minlength=n)
+
+    scores = np.zeros(n, dtype=np.int64)
+    scores[np.searchsorted(users, participants['user_id'])] = participants['score']
+
+    return [
+        dict(twow_id=twow_id, user_id=int(user_id), responses=int(count), upvotes=int(up), downvotes=int(down), rating_total=float(total), score=int(score))
+        for user_id, count, up, down, total, score in zip(users, counts, upvotes, downvotes, rating_total, scores)
+    ]
+
+
+def round_summary(twow_id: int, responses: dict, votes: dict):
+    """
+    Per-round response counts (prompt popularity) and voter participation for one season.
+    """
+    rounds = np.union1d(responses['round'], votes['round'])
+    n = len(rounds)
+
+    response_counts = np.bincount(np.searchsorted(rounds, responses['round']), minlength=n)
+    vote_counts = np.bincount(np.searchsorted(rounds, votes['round']), minlength=n)
+
+    voter_rounds = np.unique(np.stack([votes['round'], votes['user_id']], axis=1), axis=0)[:, 0] if len(votes['round']) else votes['round']
+    voter_counts = np.bincount(np.searchsorted(rounds, voter_rounds), minlength=n)
+
+    return [
+        dict(twow_id=twow_id, round=int(r), responses=int(n_responses), votes=int(n_votes), voters=int(n_voters))
+        for r, n_responses, n_votes, n_voters in zip(rounds, response_counts, vote_counts, voter_counts)
+    ]
+
+
+async def refresh(twow_id: int, rounds: Optional[list[int]] = None):
+    """
+    Recompute the materialized statistics of a season. Round statistics are only recomputed for the given rounds (all rounds by default).
+    """
+    data = await columns(twow_id)
+    if rounds is not None:
+        mask = np.isin(data[Vote]['round'], rounds)
+        data[Vote] = {name: column[mask] for name, column in data[Vote].items()}
+        mask = np.isin(data[Response]['round'], rounds)
+        round_responses = {name: column[mask] for name, column in data[Response].items()}
+    else:
+        round_responses = data[Response]
+
+    user_rows = user_summary(twow_id, data[Participant], data[Response])
+    round_rows = round_summary(twow_id, round_responses, data[Vote])
+
+    async with db.session() as session, session.begin():
+        await session.execute(db.delete(UserStats).where(UserStats.twow_id == twow_id))
+        if user_rows:
+            await session.execute(db.insert(UserStats), user_rows)
+
+        stmt = db.delete(RoundStats).where(RoundStats.twow_id == twow_id)
+        if rounds is not None:
+            stmt = stmt.where(RoundStats.round.in_(rounds))
+        await session.execute(stmt)
+        if round_rows:
+            await session.execute(db.insert(RoundStats), round_rows)
+
+    logger.debug(f'Refreshed statistics for TWOW {twow_id} ({len(user_rows)} users, {len(round_rows)} rounds).')
+
+
+async def user_report(guild_id: int, user_id: int, name: str):
+    """
+    Summary of a user's statistics across all seasons in a server.
+    """
+    async with db.session() as session:
+        stmt = db.select(
+            db.func.count(UserStats.twow_id),
+            db.func.sum(UserStats.responses),
+            db.func.sum(UserStats.upvotes),
+            db.func.sum(UserStats.downvotes),
+            db.func.sum(UserStats.rating_total),
+            db.func.sum(UserStats.score)
+        ).join(Twow, Twow.id == UserStats.twow_id).where(
+            Twow.guild_id == guild_id,
+            UserStats.user_id == user_id
+        )
+        seasons, responses, upvotes, downvotes, rating_total, score = (await session.execute(stmt)).one()
+
+        stmt = db.select(db.func.count(Prompt.id)).where(Prompt.guild_id == guild_id, Prompt.user_id == user_id)
+        prompts = (await session.execute(stmt)).scalar_one()
+
+    if not seasons:
+        return f'{name} has not played any TWOW seasons here yet.'
+
+    votes = upvotes + downvotes
+    win_rate = f'{100 * upvotes / votes:.1f}%' if votes else 'n/a'
+    average_rating = f'{rating_total / responses:.0f}' if responses else 'n/a'
+    return '\n'.join([
+        f'**{name}** across {seasons} season(s):',
+        f'- {responses} response(s), {score} total points',
+        f'- Win rate: {win_rate} ({upvotes}/{downvotes})',
+        f'- Average rating: {average_rating} ELO',
+        f'- Prompts suggested: {prompts}',
+    ])
+
+
+async def guild_report(guild_id: int):
+    """
+    Win rate leaderboard and the latest season's participation curve for a server.
+    """
+    async with db.session() as session:
+        upvotes = db.func.sum(UserStats.upvotes)
+        votes = upvotes + db.func.sum(UserStats.downvotes)
+        stmt = db.select(UserStats.user_id, upvotes, votes).join(Twow, Twow.id == UserStats.twow_id).where(
+            Twow.guild_id == guild_id
+        ).group_by(UserStats.user_id).having(votes >= MIN_VOTES).order_by((1. * upvotes / votes).desc()).limit(10)
+        leaders = (await session.execute(stmt)).all()
+
+        stmt = db.select(db.func.max(RoundStats.twow_id)).join(Twow, Twow.id == RoundStats.twow_id).where(Twow.guild_id == guild_id)
+        latest = (await session.execute(stmt)).scalar_one()
+
+        stmt = db.select(RoundStats).where(RoundStats.twow_id == latest).order_by(RoundStats.round)
+        rounds = (await session.scalars(stmt)).all()
+
+    if not leaders and not rounds:
+        return 'No statistics yet! Statistics are collected whenever a round concludes.'
+
+    lines = ['**Win rates:**']
+    for rank, (user_id, up, total) in enumerate(leaders, start=1):
+        lines.append(f'{rank}. <@{user_id}> - {100 * up / total:.1f}% ({up}/{total - up})')
+    if rounds:
+        lines.append(f'**Participation in TWOW {latest}:**')
+        for round_stats in rounds:
+            lines.append(f'Round {round_stats.round}: {round_stats.responses} response(s), {round_stats.voters} voter(s), {round_stats.votes} vote(s)')
+    return '\n'.join(lines)
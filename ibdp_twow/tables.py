@@ -1,6 +1,26 @@
+from typing import Optional
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
 import db
 from db import Base, mapped_column
-from db import Integer, String, Float, ForeignKey
+from db import Integer, String, Float, Boolean, DateTime, ForeignKey, Index, UniqueConstraint
+
+from utils.text import Normalized, normalize
+from utils.compaction import purge
+
+
+MAX_WORDS = 10
+
+
+def live(cls):
+    """
+    Filters excluding soft-deleted rows, for tables that have them.
+    """
+    return [cls.deleted.is_(False)] if hasattr(cls, 'deleted') else []
 
 
 class Participant(Base):
@@ -11,6 +31,12 @@ class Participant(Base):
     user_id = mapped_column(Integer)
     moniker = mapped_column(String(32), nullable=True)
     score = mapped_column(Integer, default=0)
+    deleted = mapped_column(Boolean, default=False)  # purged later by compact()
+
+    __table_args__ = (
+        UniqueConstraint('twow_id', 'user_id'),
+        Index('ix_ib_participants_deleted', 'id', sqlite_where=deleted.is_(True)),
+    )
 
     def __repr__(self):
         return f'Participant({self.id}, twow_id={self.twow_id}, user_id={self.user_id}, moniker="{self.moniker}", score={self.score})'
@@ -20,11 +46,28 @@ class Participant(Base):
         async with db.session() as session:
             stmt = db.select(cls).where(
                 cls.twow_id == twow_id,
-                cls.user_id == user_id
+                cls.user_id == user_id,
+                cls.deleted.is_(False)
             )
             participant = (await session.scalars(stmt)).one_or_none()
         return participant
 
+    @classmethod
+    async def upsert(cls, session, *, twow_id, user_id, moniker=None):
+        """
+        Insert a participant, or update their moniker if one is given. Returns the stored participant.
+        A removed participant who signs up again starts over.
+        """
+        stmt = db.sqlite_insert(cls).values(twow_id=twow_id, user_id=user_id, moniker=moniker, deleted=False)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.twow_id, cls.user_id],
+            set_={
+                'moniker': db.case((cls.deleted, stmt.excluded.moniker), else_=db.func.coalesce(stmt.excluded.moniker, cls.moniker)),
+                'deleted': False
+            }
+        ).returning(cls)
+        return (await session.scalars(stmt)).one()
+
 
 class Response(Base):
     __tablename__ = 'ib_responses'
@@ -34,10 +77,19 @@ class Response(Base):
     user_id = mapped_column(Integer)
     round = mapped_column(Integer)
     content = mapped_column(String, nullable=True)
+    word_count = mapped_column(Integer, nullable=True)
+    content_hash = mapped_column(String, nullable=True)  # see utils/text.py
     rating = mapped_column(Float, default=1000.)
     upvotes = mapped_column(Integer, default=0)
     downvotes = mapped_column(Integer, default=0)
     score = mapped_column(Integer, nullable=True)
+    deleted = mapped_column(Boolean, default=False)  # purged later by compact()
+
+    __table_args__ = (
+        UniqueConstraint('twow_id', 'round', 'user_id'),
+        Index('ix_ib_responses_content_hash', 'twow_id', 'round', 'content_hash'),
+        Index('ix_ib_responses_deleted', 'id', sqlite_where=deleted.is_(True)),
+    )
 
     def __repr__(self):
         return f'Response({self.id}, "{self.content}", twow_id={self.twow_id}, user_id={self.user_id}, round={self.round}, rating={self.rating}, score={self.score})'
@@ -48,25 +100,42 @@ class Response(Base):
             stmt = db.select(cls).where(
                 cls.twow_id == twow_id,
                 cls.user_id == user_id,
-                cls.round == twow_round
+                cls.round == twow_round,
+                cls.deleted.is_(False)
             )
             participant = (await session.scalars(stmt)).one_or_none()
         return participant
 
+    @staticmethod
+    def validate(content: Normalized):
+        """
+        Reason a response breaks the rules, or None if it is fine.
+        """
+        if content.word_count == 0:
+            return 'Your response is empty!'
+        if content.word_count > MAX_WORDS:
+            return f'Your response has {content.word_count} words, but responses can have at most {MAX_WORDS}.'
+        return None
+
     @classmethod
-    async def update_ratings(cls, *, upvoted, downvoted, weights: tuple[int] = (1, 1)):
+    async def upsert(cls, session, *, twow_id, twow_round, user_id, content: Optional[Normalized] = None):
         """
-        Update response entries in the database based on vote.
+        Insert a response, or update its content if some is given. Returns the stored response.
+        A deleted response that is submitted again does not get its old content back.
         """
-        w1, w2 = weights
-        rating_difference = upvoted.rating - downvoted.rating
-        expected_value = 1 / (1 + 10 ** (rating_difference / 400))  # adapted from https://en.wikipedia.org/wiki/Elo_rating_system
-        async with db.session() as session, session.begin():
-            session.add_all([upvoted, downvoted])
-            upvoted.upvotes += 1
-            downvoted.downvotes += 1
-            upvoted.rating += 50 * expected_value * w1
-            downvoted.rating -= 50 * expected_value * w2
+        derived = dict(content=content.content, word_count=content.word_count, content_hash=content.content_hash) if content else {}
+        stmt = db.sqlite_insert(cls).values(twow_id=twow_id, round=twow_round, user_id=user_id, deleted=False, **derived)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.twow_id, cls.round, cls.user_id],
+            set_={
+                **{
+                    name: db.case((cls.deleted, getattr(stmt.excluded, name)), else_=db.func.coalesce(getattr(stmt.excluded, name), getattr(cls, name)))
+                    for name in ['content', 'word_count', 'content_hash']
+                },
+                'deleted': False
+            }
+        ).returning(cls)
+        return (await session.scalars(stmt)).one()
 
 
 class Vote(Base):
@@ -78,6 +147,64 @@ class Vote(Base):
     round = mapped_column(Integer)
     upvoted_id = mapped_column(ForeignKey('ib_responses.id'))
     downvoted_id = mapped_column(ForeignKey('ib_responses.id'))
+    side = mapped_column(Integer, nullable=True)  # option the upvoted response was shown as, see utils/vote_quality.py
+    timestamp = mapped_column(DateTime(timezone=True), default=db.func.now())
 
     def __repr__(self):
-        return f'Vote({self.id}, {self.upvoted_id}, {self.downvoted_id}, twow_id={self.twow_id}, user_id={self.user_id}, round={self.round})'
+        return f'Vote({self.id}, {self.upvoted_id}, {self.downvoted_id}, twow_id={self.twow_id}, user_id={self.user_id}, round={self.round}, side={self.side})'
+
+
+class UserStats(Base):
+    __tablename__ = 'ib_user_stats'
+
+    twow_id = mapped_column(ForeignKey('twows.id'), primary_key=True)
+    user_id = mapped_column(Integer, primary_key=True)
+    responses = mapped_column(Integer, default=0)
+    upvotes = mapped_column(Integer, default=0)
+    downvotes = mapped_column(Integer, default=0)
+    rating_total = mapped_column(Float, default=0.)
+    score = mapped_column(Integer, default=0)
+
+    def __repr__(self):
+        return f'UserStats(twow_id={self.twow_id}, user_id={self.user_id}, responses={self.responses}, upvotes={self.upvotes}, downvotes={self.downvotes}, score={self.score})'
+
+
+class RoundStats(Base):
+    __tablename__ = 'ib_round_stats'
+
+    twow_id = mapped_column(ForeignKey('twows.id'), primary_key=True)
+    round = mapped_column(Integer, primary_key=True)
+    responses = mapped_column(Integer, default=0)
+    votes = mapped_column(Integer, default=0)
+    voters = mapped_column(Integer, default=0)
+
+    def __repr__(self):
+        return f'RoundStats(twow_id={self.twow_id}, round={self.round}, responses={self.responses}, votes={self.votes}, voters={self.voters})'
+
+
+async def backfill():
+    """
+    Derive the normalized columns of responses stored before they existed.
+    """
+    async with db.session() as session, session.begin():
+        stmt = db.select(Response.id, Response.content).where(Response.content.is_not(None), Response.content_hash.is_(None))
+        rows = (await session.execute(stmt)).all()
+        if rows:
+            await session.execute(db.update(Response), [
+                dict(id=response_id, content=normalized.content, word_count=normalized.word_count, content_hash=normalized.content_hash)
+                for response_id, normalized in ((response_id, normalize(content)) for response_id, content in rows)
+            ])
+            logger.info(f'Backfilled {len(rows)} response(s).')
+
+
+async def compact():
+    """
+    Purge soft-deleted participants and responses, along with any votes for those responses.
+    """
+    def votes(response_ids):
+        return db.delete(Vote).where(db.or_(Vote.upvoted_id.in_(response_ids), Vote.downvoted_id.in_(response_ids)))
+
+    return {
+        Response.__tablename__: await purge(Response, dependents=[votes]),
+        Participant.__tablename__: await purge(Participant),
+    }
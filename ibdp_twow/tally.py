@@ -0,0 +1,132 @@
+import asyncio
+from collections import defaultdict
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+from db import Twow
+from .tables import Response, Vote
+
+
+INITIAL_RATING = 1000.
+STANDINGS_SIZE = 10
+
+
+def expected_loss(upvoted_rating: float, downvoted_rating: float):
+    """
+    Elo expectation used to move ratings after a vote.
+    """
+    rating_difference = upvoted_rating - downvoted_rating
+    return 1 / (1 + 10 ** (rating_difference / 400))  # adapted from https://en.wikipedia.org/wiki/Elo_rating_system
+
+
+class Tally:
+    """
+    Running vote counts and provisional (unweighted) ratings for one TWOW round.
+    """
+
+    def __init__(self, twow_id: int, twow_round: int):
+        self.twow_id = twow_id
+        self.round = twow_round
+
+        self.contents: dict[int, str] = {}
+        self.ratings: dict[int, float] = {}
+        self.upvotes: dict[int, int] = defaultdict(int)
+        self.downvotes: dict[int, int] = defaultdict(int)
+        self.history: dict[int, list[tuple[int, int]]] = defaultdict(list)  # user id -> [(upvoted id, downvoted id), ...]
+
+        self.version = 0
+        self._standings = None
+        self._standings_version = -1
+
+    def __repr__(self):
+        return f'Tally(twow_id={self.twow_id}, round={self.round}, responses={len(self.ratings)}, version={self.version})'
+
+    def add_response(self, response: Response):
+        self.contents[response.id] = response.content
+        self.ratings[response.id] = INITIAL_RATING
+        self.version += 1
+
+    def record(self, user_id: int, upvoted_id: int, downvoted_id: int):
+        """
+        Apply a single vote to the tally.
+        """
+        if upvoted_id not in self.ratings or downvoted_id not in self.ratings:
+            logger.warning(f'{self} received a vote for an unknown response ({upvoted_id}, {downvoted_id}).')
+            return
+        expected_value = expected_loss(self.ratings[upvoted_id], self.ratings[downvoted_id])
+        self.ratings[upvoted_id] += 50 * expected_value
+        self.ratings[downvoted_id] -= 50 * expected_value
+        self.upvotes[upvoted_id] += 1
+        self.downvotes[downvoted_id] += 1
+        self.history[user_id].append((upvoted_id, downvoted_id))
+        self.version += 1
+
+    @property
+    def vote_count(self):
+        return sum(len(votes) for votes in self.history.values())
+
+    def standings(self):
+        """
+        Rendered standings preview. Only re-rendered after new votes arrive.
+        """
+        if self._standings_version == self.version:
+            return self._standings
+
+        ranked = sorted(self.ratings, key=self.ratings.get, reverse=True)
+        lines = [f'Provisional standings for round {self.round} ({self.vote_count} vote(s) from {len(self.history)} voter(s)):']
+        for rank, response_id in enumerate(ranked[:STANDINGS_SIZE], start=1):
+            rating = round(self.ratings[response_id])
+            lines.append(f'{rank}. `{self.contents[response_id]}` - {rating} ELO ({self.upvotes[response_id]}/{self.downvotes[response_id]})')
+        if len(ranked) > STANDINGS_SIZE:
+            lines.append(f'... and {len(ranked) - STANDINGS_SIZE} more.')
+
+        self._standings = '\n'.join(lines)
+        self._standings_version = self.version
+        return self._standings
+
+
+_tallies: dict[int, Tally] = {}
+_lock = asyncio.Lock()
+
+
+async def fetch(twow: Twow):
+    """
+    Fetch the tally for the current round of a TWOW, loading it from the database on first use.
+    """
+    tally = _tallies.get(twow.id)
+    if tally and tally.round == twow.current_round:
+        return tally
+
+    async with _lock:
+        tally = _tallies.get(twow.id)
+        if tally and tally.round == twow.current_round:
+            return tally
+
+        tally = Tally(twow.id, twow.current_round)
+        async with db.session() as session:
+            stmt = db.select(Response).where(
+                Response.twow_id == twow.id,
+                Response.round == twow.current_round,
+                Response.deleted.is_(False)
+            )
+            for response in (await session.scalars(stmt)).all():
+                tally.add_response(response)
+
+            stmt = db.select(Vote).where(
+                Vote.twow_id == twow.id,
+                Vote.round == twow.current_round
+            ).order_by(Vote.id)
+            for vote in (await session.scalars(stmt)).all():
+                tally.record(vote.user_id, vote.upvoted_id, vote.downvoted_id)
+
+        _tallies[twow.id] = tally
+        logger.debug(f'Loaded {tally}.')
+    return tally
+
+
+def discard(twow_id: int):
+    _tallies.pop(twow_id, None)
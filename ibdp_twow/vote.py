@@ -1,5 +1,7 @@
-from collections import Counter
+import asyncio
+from collections import Counter, deque
 import random
+from typing import Optional
 
 import discord
 
@@ -9,38 +11,28 @@ logger = logging.getLogger(__name__)
 
 # project imports
 import db
-from db import Twow
+from db import Twow, TwowState
 from .tables import Participant, Response, Vote
+from . import tally
 
-from utils.views import EmptyView
+from utils.views import TwowView, EmptyView, current, reply, edit
+from utils.admission import admission, Overloaded
+from utils.vote_quality import LEFT, RIGHT
+from utils.ratelimit import RateLimiter
 
 
-async def formatted_options(interaction: discord.Interaction, twow: Twow, vote_count = 0):
-    """
-    Fetch and format prompt responses for a user to vote between.
-    """
-    vote_chip = f' [{vote_count} recorded vote(s)]' if vote_count else ''
-
-    async with db.session() as session, session.begin():
-        stmt = db.select(Response).where(
-            Response.twow_id == twow.id,
-            Response.round == twow.current_round,
-            Response.user_id != interaction.user.id
-        )
-        responses = (await session.scalars(stmt)).all()
+BUSY_MESSAGE = 'Lots of people are voting right now! Please try again in a few seconds.'
+SLOW_DOWN_MESSAGE = 'You are voting too quickly! Take a moment to read both responses. (You can vote again in {seconds:.0f} s.)'
 
-        stmt = db.select(Vote).where(
-            Vote.twow_id == twow.id,
-            Vote.round == twow.current_round,
-            Vote.user_id == interaction.user.id
-        )
-        votes = (await session.scalars(stmt)).all()
+PREFETCH_DEPTH = 2  # ballots computed ahead per voter
 
-    if len(responses) < 2:
-        return 'Not enough responses!', EmptyView(twow)
+limiter = RateLimiter(rate=1., capacity=5.)  # vote clicks per user, sharded by TWOW
 
-    vote_pairs = [(vote.upvoted_id, vote.downvoted_id) for vote in votes]
 
+def choose_pair(responses: list[Response], vote_pairs: list[tuple[int, int]]):
+    """
+    Pick the next pair of responses to vote between, in display order, or None if every pair has been voted on.
+    """
     # select least-seen prompt
     c = Counter({response.id: 0 for response in responses})
     c.update(sum(vote_pairs, ()))  # "sum" flattens vote_pairs
@@ -49,7 +41,6 @@ async def formatted_options(interaction: discord.Interaction, twow: Twow, vote_c
     id_pool = [response_id for response_id, freq in freqs if freq == lowest]
 
     id = random.choice(id_pool)
-    logger.debug([response for response in responses if response.id == id])
     r1 ,= [response for response in responses if response.id == id]
     # confusing syntax - this unpacks a single-element collection (only one element is expected)
 
@@ -57,18 +48,138 @@ async def formatted_options(interaction: discord.Interaction, twow: Twow, vote_c
                      if response.id != r1.id and not any(response.id in pair and r1.id in pair for pair in vote_pairs)]
     # if all possible vote combinations have been recorded, this list should be empty
     if not response_pool:
-        content = f"You have voted the maximum number of times for this round! {vote_chip}"
-        view = EmptyView(twow)
-        return content, view
+        return None
     r2 = random.choice(response_pool)
 
     if random.random() < 0.5:
         r2, r1 = r1, r2
+    return r1, r2
 
 
+def ballot(twow: Twow, pair: Optional[tuple[Response, Response]], vote_count = 0):
+    """
+    Message content and view for a pair of responses.
+    """
+    vote_chip = f' [{vote_count} recorded vote(s)]' if vote_count else ''
+    if pair is None:
+        return f"You have voted the maximum number of times for this round! {vote_chip}", EmptyView(twow)
+    r1, r2 = pair
     content = f"Which response do you prefer?{vote_chip}\n**Option 1** - `{r1.content}`\n**Option 2** - `{r2.content}`"
-    view = ParticipantVoteView(twow, r1, r2, count=vote_count + 1)
-    return content, view
+    return content, ParticipantVoteView(twow, r1, r2, count=vote_count + 1)
+
+
+class Prefetch:
+    """
+    Ballots computed ahead for one voter while they read the current one.
+    Pair selection does not depend on which option is picked, so the ballots assume the voter votes on every pair
+    they are shown, and are only used while the voter's actual history matches that assumption.
+    """
+
+    def __init__(self, twow_round: int, responses: list[Response], vote_pairs: list[tuple[int, int]]):
+        self.round = twow_round
+        self.responses = responses
+        self.assumed = list(vote_pairs)  # history the last queued ballot follows
+        self.queue: deque[tuple[int, Optional[tuple[Response, Response]]]] = deque()  # (votes before, pair)
+        self.task: Optional[asyncio.Task] = None
+
+    def __repr__(self):
+        return f'Prefetch(round={self.round}, assumed={len(self.assumed)}, queued={len(self.queue)})'
+
+    def start(self):
+        self.task = asyncio.create_task(self._fill())
+
+    async def _fill(self):
+        while len(self.queue) < PREFETCH_DEPTH:
+            pair = choose_pair(self.responses, self.assumed)
+            self.queue.append((len(self.assumed), pair))
+            if pair is None:
+                return
+            r1, r2 = pair
+            self.assumed.append((r1.id, r2.id))
+            await asyncio.sleep(0)
+
+    async def take(self, twow_round: int, history: list[tuple[int, int]]):
+        """
+        The prefetched ballot that follows `history`, or None if the prefetch no longer applies.
+        """
+        await self.task
+        if twow_round != self.round or not self.queue or not history:
+            return None
+        votes_before, pair = self.queue[0]
+        if votes_before != len(history) or set(self.assumed[votes_before - 1]) != set(history[-1]):
+            return None
+        self.queue.popleft()
+        if pair is not None:
+            self.start()  # top up while this ballot is read
+        return pair
+
+
+_prefetched: dict[tuple[int, int], Prefetch] = {}  # (twow id, user id) -> ballots ahead
+
+
+def drop_prefetched(twow_id: int):
+    """
+    Forget every prefetched ballot of a TWOW, e.g. once its voting ends or a response is deleted.
+    """
+    for key in [key for key in _prefetched if key[0] == twow_id]:
+        del _prefetched[key]
+
+
+def end_voting(twow_id: int):
+    """
+    Drop the per-TWOW voting state (prefetched ballots, rate limit buckets) once its voting ends.
+    """
+    drop_prefetched(twow_id)
+    limiter.discard(twow_id)
+
+
+def prefetch(twow: Twow, user_id: int, responses: list[Response], vote_pairs: list[tuple[int, int]]):
+    ahead = _prefetched[twow.id, user_id] = Prefetch(twow.current_round, responses, vote_pairs)
+    ahead.start()
+
+
+async def next_ballot(twow: Twow, user_id: int, history: list[tuple[int, int]]):
+    """
+    The prefetched ballot following a user's vote history, or None if there is none to use.
+    """
+    ahead = _prefetched.get((twow.id, user_id))
+    if ahead is None:
+        return None
+    pair = await ahead.take(twow.current_round, history)
+    if pair is None:
+        _prefetched.pop((twow.id, user_id), None)
+    return pair
+
+
+async def formatted_options(interaction: discord.Interaction, twow: Twow, vote_count = 0):
+    """
+    Fetch and format prompt responses for a user to vote between, and start prefetching the ballots after it.
+    """
+    async with db.session() as session, session.begin():
+        stmt = db.select(Response).where(
+            Response.twow_id == twow.id,
+            Response.round == twow.current_round,
+            Response.user_id != interaction.user.id,
+            Response.deleted.is_(False)
+        )
+        responses = (await session.scalars(stmt)).all()
+
+        stmt = db.select(Vote).where(
+            Vote.twow_id == twow.id,
+            Vote.round == twow.current_round,
+            Vote.user_id == interaction.user.id
+        )
+        votes = (await session.scalars(stmt)).all()
+
+    if len(responses) < 2:
+        return 'Not enough responses!', EmptyView(twow)
+
+    vote_pairs = [(vote.upvoted_id, vote.downvoted_id) for vote in votes]
+    pair = choose_pair(responses, vote_pairs)
+    if pair is not None:
+        r1, r2 = pair
+        prefetch(twow, interaction.user.id, responses, vote_pairs + [(r1.id, r2.id)])
+    return ballot(twow, pair, vote_count)
 
 
 
@@ -81,6 +192,45 @@ class ParticipantVoteView(discord.ui.View):
         self.right: Response = right
         self.count: int = count
 
+    async def interaction_check(self, interaction: discord.Interaction):
+        self.twow = await current(interaction, self.twow, TwowState.VOTING)  # the canonical state at click time
+        return self.twow is not None
+
+    async def record_vote(self, interaction: discord.Interaction, upvoted: Response, downvoted: Response, side: int):
+        """
+        Store a vote, apply it to the live tally and show the next pair of responses.
+        """
+        if not limiter.allow(self.twow.id, interaction.user.id):
+            # answered without touching the database; the ballot stays up so the vote can be cast again
+            seconds = max(1., limiter.retry_after(self.twow.id, interaction.user.id))
+            await reply(interaction, SLOW_DOWN_MESSAGE.format(seconds=seconds), ephemeral=True)
+            return
+        try:
+            async with admission.admit(self.twow.id, defer=interaction.response.defer):
+                round_tally = await tally.fetch(self.twow)
+                user_vote = Vote(
+                    twow_id=self.twow.id,
+                    user_id=interaction.user.id,
+                    round=self.twow.current_round,
+                    upvoted_id=upvoted.id,
+                    downvoted_id=downvoted.id,
+                    side=side
+                )
+                async with db.session() as session, session.begin():
+                    session.add(user_vote)
+                round_tally.record(interaction.user.id, upvoted.id, downvoted.id)
+
+                history = round_tally.history[interaction.user.id]
+                pair = await next_ballot(self.twow, interaction.user.id, history)
+                if pair is not None:
+                    content, view = ballot(self.twow, pair, len(history))
+                else:
+                    content, view = await formatted_options(interaction, self.twow, self.count)
+        except Overloaded:
+            await reply(interaction, BUSY_MESSAGE, ephemeral=True)
+            return
+        await edit(interaction, content=content, view=view)
+
     @discord.ui.button(
         label='Option 1',
         row=0,
@@ -88,18 +238,7 @@ class ParticipantVoteView(discord.ui.View):
         custom_id='vote:left'
     )
     async def left(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_vote = Vote(
-            twow_id=self.twow.id,
-            user_id=interaction.user.id,
-            round=self.twow.current_round,
-            upvoted_id=self.left.id,
-            downvoted_id=self.right.id
-        )
-        async with db.session() as session, session.begin():
-            session.add(user_vote)
-
-        content, view = await formatted_options(interaction, self.twow, self.count)
-        await interaction.response.edit_message(content=content, view=view)
+        await self.record_vote(interaction, upvoted=self.left, downvoted=self.right, side=LEFT)
 
     @discord.ui.button(
         label='Option 2',
@@ -108,26 +247,13 @@ class ParticipantVoteView(discord.ui.View):
         custom_id='vote:right'
     )
     async def right(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_vote = Vote(
-            twow_id=self.twow.id,
-            user_id=interaction.user.id,
-            round=self.twow.current_round,
-            upvoted_id=self.right.id,
-            downvoted_id=self.left.id
-        )
-        async with db.session() as session, session.begin():
-            session.add(user_vote)
+        await self.record_vote(interaction, upvoted=self.right, downvoted=self.left, side=RIGHT)
 
-        content, view = await formatted_options(interaction, self.twow, self.count)
-        await interaction.response.edit_message(content=content, view=view)
 
+class VotingView(TwowView):
 
-class VotingView(discord.ui.View):
+    state = TwowState.VOTING
 
-    def __init__(self, twow: Twow):
-        super().__init__(timeout=None)
-        self.twow = twow
-    
     @discord.ui.button(
         label='Vote here!',
         row = 0,
@@ -135,12 +261,18 @@ class VotingView(discord.ui.View):
         custom_id='voting:vote'
     )
     async def start_voting(self, interaction: discord.Interaction, button: discord.ui.Button):
-        async with db.session() as session, session.begin():
-            stmt = db.select(Vote).where(
-                Vote.twow_id == self.twow.id,
-                Vote.round == self.twow.current_round,
-                Vote.user_id == interaction.user.id
-            )
-            votes = (await session.scalars(stmt)).all()
-        content, view = await formatted_options(interaction, self.twow, vote_count=len(votes))
-        await interaction.response.send_message(content=content, view=view, ephemeral=True)
+        twow = self.resolve(interaction)
+        try:
+            async with admission.admit(twow.id, defer=lambda: interaction.response.defer(ephemeral=True, thinking=True)):
+                async with db.session() as session, session.begin():
+                    stmt = db.select(Vote).where(
+                        Vote.twow_id == twow.id,
+                        Vote.round == twow.current_round,
+                        Vote.user_id == interaction.user.id
+                    )
+                    votes = (await session.scalars(stmt)).all()
+                content, view = await formatted_options(interaction, twow, vote_count=len(votes))
+        except Overloaded:
+            await reply(interaction, BUSY_MESSAGE, ephemeral=True)
+            return
+        await reply(interaction, content, view=view, ephemeral=True)
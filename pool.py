@@ -0,0 +1,112 @@
+from typing import Optional
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+from db import Prompt, PromptBand
+from utils import minhash
+
+
+DUPLICATE_THRESHOLD = 0.6  # estimated Jaccard similarity above which a prompt counts as a near-duplicate
+PAGE_SIZE = 10
+
+
+def fingerprint(content: str):
+    return minhash.signature(minhash.shingles(content))
+
+
+async def find_duplicate(session, guild_id: Optional[int], content: str, sig=None):
+    """
+    Most similar earlier prompt of a server whose estimated similarity reaches DUPLICATE_THRESHOLD, if any.
+    Only prompts sharing at least one LSH bucket are compared, so this does not scan the pool.
+    """
+    sig = fingerprint(content) if sig is None else sig
+    buckets = minhash.bands(sig)
+
+    stmt = db.select(Prompt).join(PromptBand, PromptBand.prompt_id == Prompt.id).where(
+        Prompt.guild_id == guild_id,
+        db.or_(*(db.and_(PromptBand.band == band, PromptBand.bucket == bucket) for band, bucket in enumerate(buckets)))
+    ).distinct()
+    candidates = (await session.scalars(stmt)).all()
+
+    best, best_similarity = None, DUPLICATE_THRESHOLD
+    for candidate in candidates:
+        similarity = minhash.similarity(sig, fingerprint(candidate.content))
+        if similarity >= best_similarity:
+            best, best_similarity = candidate, similarity
+    return best
+
+
+async def add(user_id: int, guild_id: Optional[int], content: str):
+    """
+    Add a prompt to a server's pool unless a near-duplicate is already in it.
+    Returns `(prompt, duplicate)`, exactly one of which is not None.
+    """
+    sig = fingerprint(content)
+    async with db.session() as session, session.begin():
+        duplicate = await find_duplicate(session, guild_id, content, sig)
+        if duplicate is not None:
+            return None, duplicate
+
+        prompt = Prompt(user_id=user_id, guild_id=guild_id, content=content)
+        session.add(prompt)
+        await session.flush()
+        await session.execute(db.insert(PromptBand), [
+            dict(prompt_id=prompt.id, band=band, bucket=bucket) for band, bucket in enumerate(minhash.bands(sig))
+        ])
+
+    logger.debug(f'Added prompt {prompt.id} to the pool of guild {guild_id}.')
+    return prompt, None
+
+
+async def backfill(legacy_guild_id: int):
+    """
+    Bring prompts submitted before pools were per server and deduplicated into the pool: they are assigned to
+    `legacy_guild_id` (earlier versions only ran in one server) and indexed for duplicate detection.
+    """
+    async with db.session() as session, session.begin():
+        assigned = (await session.execute(
+            db.update(Prompt).where(Prompt.guild_id.is_(None)).values(guild_id=legacy_guild_id)
+        )).rowcount
+
+        stmt = db.select(Prompt.id, Prompt.content).where(~db.select(PromptBand.prompt_id).where(PromptBand.prompt_id == Prompt.id).exists())
+        unindexed = (await session.execute(stmt)).all()
+        if unindexed:
+            await session.execute(db.insert(PromptBand), [
+                dict(prompt_id=prompt_id, band=band, bucket=bucket)
+                for prompt_id, content in unindexed
+                for band, bucket in enumerate(minhash.bands(fingerprint(content)))
+            ])
+
+    if assigned or unindexed:
+        logger.info(f'Backfilled {assigned} prompt(s) into the pool of guild {legacy_guild_id}, indexed {len(unindexed)} prompt(s).')
+
+
+def _match_query(query: str):
+    # quote every term so user input is never parsed as FTS5 query syntax
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+async def search(guild_id: Optional[int], query: str = '', page: int = 1):
+    """
+    One page of a server's prompts matching a full-text query, best matches first (newest first without a query).
+    Returns `(prompts, pages)`.
+    """
+    if query.strip():
+        fts = db.text('SELECT rowid AS id, bm25(prompts_fts) AS rank FROM prompts_fts WHERE prompts_fts MATCH :query').bindparams(
+            query=_match_query(query)
+        ).columns(id=db.Integer, rank=db.Float).subquery()
+        base = db.select(Prompt).join(fts, fts.c.id == Prompt.id).where(Prompt.guild_id == guild_id)
+        order = (fts.c.rank, Prompt.id.desc())
+    else:
+        base = db.select(Prompt).where(Prompt.guild_id == guild_id)
+        order = (Prompt.id.desc(),)
+
+    async with db.session() as session:
+        total = (await session.execute(db.select(db.func.count()).select_from(base.subquery()))).scalar_one()
+        prompts = (await session.scalars(base.order_by(*order).limit(PAGE_SIZE).offset((page - 1) * PAGE_SIZE))).all()
+
+    return prompts, max(1, -(-total // PAGE_SIZE))
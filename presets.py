@@ -0,0 +1,133 @@
+import time
+import asyncio
+import importlib
+import importlib.metadata
+from typing import Callable, Optional
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+from utils.views import disabled
+
+
+ENTRY_POINT_GROUP = 'dtwow.presets'
+BUILTIN_PRESETS = {'ibdp_twow': 'ibdp_twow'}  # presets shipped in this repository (not installed as packages)
+
+
+class Preset:
+    """
+    A loaded game preset. Attribute access falls through to the preset package (e.g. `preset.results`).
+
+    A preset package defines `TABLE_PREFIX` (all of its tables are named with it), `state_views()` (the view class of
+    each TWOW state) and the submodules the bot uses: `tables`, `tally`, `results`, `stats`, `archive`.
+    It may define `async close()`, which is awaited on shutdown.
+    """
+
+    def __init__(self, name: str, module):
+        self.name = name
+        self.module = module
+        self.views = module.state_views()
+        self.disabled_views = {state: disabled(view_cls(None)) for state, view_cls in self.views.items()}  # swapped onto old messages
+
+    def __repr__(self):
+        return f'Preset({self.name}, prefix={self.module.TABLE_PREFIX})'
+
+    def __getattr__(self, name: str):
+        return getattr(self.module, name)
+
+
+def discover():
+    """
+    Names and import targets of every available preset: the built-in ones plus those installed under ENTRY_POINT_GROUP.
+    """
+    available = {name: (lambda module=module: importlib.import_module(module)) for name, module in BUILTIN_PRESETS.items()}
+    for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+        available[entry_point.name] = entry_point.load
+    return available
+
+
+def import_tables():
+    """
+    Register the tables of every available preset with the metadata without loading the presets (e.g. for exports).
+    """
+    for load in discover().values():
+        importlib.import_module(f'{load().__name__}.tables')
+
+
+class PresetRegistry:
+    """
+    Loads presets the first time a channel needs them. Loading a preset imports it, checks that its tables stay in
+    its namespace, creates them, and notifies listeners (e.g. to register its persistent views).
+    """
+
+    def __init__(self, default: str):
+        self.default = default
+        self._available: dict[str, Callable] = discover()
+        self._loaded: dict[str, Preset] = {}
+        self._channels: dict[int, str] = {}
+        self._lock = asyncio.Lock()
+        self._listeners: list[Callable] = []
+        if default not in self._available:
+            raise LookupError(f'Default preset {default} is not available. (Available: {", ".join(self._available)})')
+
+    def available(self):
+        return list(self._available)
+
+    def loaded(self):
+        return list(self._loaded.values())
+
+    def on_load(self, listener: Callable):
+        self._listeners.append(listener)
+        return listener
+
+    def assign(self, channel_id: int, name: Optional[str]):
+        self._channels[channel_id] = name or self.default
+
+    def unassign(self, channel_id: int):
+        self._channels.pop(channel_id, None)
+
+    def name(self, channel_id: int):
+        return self._channels.get(channel_id, self.default)
+
+    def get(self, channel_id: int):
+        """
+        Preset of a channel if it is already loaded, else None.
+        """
+        return self._loaded.get(self.name(channel_id))
+
+    async def for_channel(self, channel_id: int):
+        return await self.load(self.name(channel_id))
+
+    async def load(self, name: str):
+        preset = self._loaded.get(name)
+        if preset is not None:
+            return preset
+
+        async with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+            if name not in self._available:
+                raise LookupError(f'Unknown preset {name}.')
+
+            start = time.perf_counter()
+            existing = set(db.Base.metadata.tables)
+            module = self._available[name]()
+            module.tables  # registers the preset's tables
+            outside = [table_name for table_name in db.Base.metadata.tables if table_name not in existing and not table_name.startswith(module.TABLE_PREFIX)]
+            if outside:
+                raise ValueError(f'Preset {name} defines tables outside its namespace {module.TABLE_PREFIX}*: {", ".join(outside)}')
+            tables = [table for table_name, table in db.Base.metadata.tables.items() if table_name.startswith(module.TABLE_PREFIX)]
+
+            await db.migrate(tables)
+            if hasattr(module.tables, 'backfill'):
+                await module.tables.backfill()
+
+            preset = Preset(name, module)
+            for listener in self._listeners:
+                listener(preset)
+            self._loaded[name] = preset
+            logger.info(f'Loaded {preset} in {1000 * (time.perf_counter() - start):.0f} ms ({len(tables)} table(s)).')
+        return preset
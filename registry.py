@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+from typing import NamedTuple, Optional
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+from db import Twow, TwowState
+
+
+class Entry(NamedTuple):
+    twow: Twow
+    version: int
+
+
+class StaleState(Exception):
+    """
+    Raised when a TWOW changed between reading its state and writing a new one.
+    """
+
+
+class TwowRegistry:
+    """
+    The one canonical `Twow` per active channel, stamped with a version that increases on every change.
+    Published objects are never mutated: writes load a fresh copy from the database, commit it and publish that copy
+    as the new canonical state (write-through). Reads only touch memory.
+    """
+
+    def __init__(self):
+        self._entries: dict[int, Entry] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._guilds: dict[int, set[int]] = {}  # guild id -> channel ids (placeholders without a guild are not indexed)
+        self._guild_versions: dict[int, int] = {}
+
+    def __contains__(self, channel_id: int):
+        return channel_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self):
+        return [(channel_id, entry.twow) for channel_id, entry in self._entries.items()]
+
+    def get(self, channel_id: int):
+        entry = self._entries.get(channel_id)
+        return entry.twow if entry else None
+
+    def entry(self, channel_id: int):
+        return self._entries.get(channel_id)
+
+    def version(self, channel_id: int):
+        entry = self._entries.get(channel_id)
+        return entry.version if entry else 0
+
+    def in_guild(self, guild_id: int):
+        """
+        `(channel id, twow)` of every indexed channel in a guild, by channel id.
+        """
+        return [(channel_id, self._entries[channel_id].twow) for channel_id in sorted(self._guilds.get(guild_id, ()))]
+
+    def guild_version(self, guild_id: int):
+        """
+        Increases whenever any channel of a guild changes, for caching per-guild renders.
+        """
+        return self._guild_versions.get(guild_id, 0)
+
+    def _index(self, channel_id: int, old: Optional[int], new: Optional[int]):
+        if old is not None:
+            self._guilds[old].discard(channel_id)
+            if not self._guilds[old]:
+                del self._guilds[old]
+            self._guild_versions[old] = self.guild_version(old) + 1
+        if new is not None:
+            self._guilds.setdefault(new, set()).add(channel_id)
+            self._guild_versions[new] = self.guild_version(new) + 1
+
+    def current(self, twow: Twow, state: Optional[TwowState] = None):
+        """
+        Canonical state of a TWOW if it is still the one running in its channel (and in `state`, if given), else None.
+        """
+        canonical = self.get(twow.channel_id)
+        if canonical is None or canonical.id != twow.id:
+            return None
+        if state is not None and canonical.state != state:
+            return None
+        return canonical
+
+    def lock(self, channel_id: int):
+        """
+        Lock serializing state changes of a channel.
+        """
+        return self._locks.setdefault(channel_id, asyncio.Lock())
+
+    def publish(self, channel_id: int, twow: Twow):
+        """
+        Make a committed `Twow` the canonical state of a channel. Callers must hold the channel's lock.
+        """
+        version = self.version(channel_id) + 1
+        old = self.get(channel_id)
+        self._entries[channel_id] = Entry(twow, version)
+        self._index(channel_id, old.guild_id if old else None, twow.guild_id)
+        logger.debug(f'Channel {channel_id} is at version {version}: {twow}')
+        return version
+
+    def remove(self, channel_id: int):
+        entry = self._entries.pop(channel_id, None)
+        self._locks.pop(channel_id, None)
+        if entry:
+            self._index(channel_id, entry.twow.guild_id, None)
+
+    def check(self, channel_id: int, version: int):
+        """
+        Raise StaleState unless a channel is still at `version`.
+        """
+        if self.version(channel_id) != version:
+            raise StaleState(f'Channel {channel_id} changed (version {version} -> {self.version(channel_id)}).')
+
+    @contextlib.asynccontextmanager
+    async def write(self, channel_id: int, twow_id: Optional[int] = None, versioned: bool = True):
+        """
+        Update a TWOW in one transaction: yields `(session, twow)` with a fresh copy from the database.
+        Once committed, the copy is published if it is the channel's canonical TWOW.
+        Changes no state check depends on (e.g. the host thread) pass `versioned=False`: the copy replaces the canonical
+        one without bumping the version, so they never make concurrent commands stale.
+        """
+        async with self.lock(channel_id):
+            canonical = self.get(channel_id)
+            if twow_id is None:
+                if canonical is None:
+                    raise KeyError(f'No TWOW is active in channel {channel_id}.')
+                twow_id = canonical.id
+            async with db.session() as session, session.begin():
+                twow = await session.get(Twow, twow_id)
+                yield session, twow
+            if canonical is not None and canonical.id == twow.id:
+                if versioned:
+                    self.publish(channel_id, twow)
+                else:
+                    self._entries[channel_id] = Entry(twow, self.version(channel_id))
+
+
+twows = TwowRegistry()
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.vote_quality import voter_stats
+
+
+# setup
+rng = np.random.default_rng(0)
+
+# parameters
+R = 300  # responses
+N = 2000  # voters
+V = 80_000  # votes from careful voters (plus 20k spam votes, about 100k in total)
+SPAMMERS = 20  # voters who always click Option 1 as fast as they can
+DURATION = 3 * 24 * 3600  # length of the voting period, in seconds
+
+# responses have a hidden quality; careful voters mostly prefer the better one
+quality = rng.normal(size=R)
+user_ids = rng.integers(0, N, V)
+pairs = np.stack([rng.integers(0, R, V), rng.integers(0, R, V)], axis=1)
+pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+user_ids = user_ids[:len(pairs)]
+timestamps = rng.uniform(0, DURATION, len(pairs))
+
+p = 1 / (1 + np.exp(quality[pairs[:, 1]] - quality[pairs[:, 0]]))  # chance of preferring the left response
+sides = (rng.random(len(pairs)) >= p).astype(np.int64)  # 0 if the left response was picked
+
+# spammers cast 1000 votes each within ten minutes, always picking the left response
+spam = np.repeat(np.arange(N, N + SPAMMERS), 1000)
+user_ids = np.concatenate([user_ids, spam])
+pairs = np.concatenate([pairs, rng.integers(0, R, (len(spam), 2))])
+keep = pairs[:, 0] != pairs[:, 1]
+sides = np.concatenate([sides, np.zeros(len(spam), dtype=np.int64)])
+timestamps = np.concatenate([timestamps, rng.uniform(0, 600, len(spam))])
+user_ids, pairs, sides, timestamps = user_ids[keep], pairs[keep], sides[keep], timestamps[keep]
+
+upvoted = np.where(sides == 0, pairs[:, 0], pairs[:, 1])
+downvoted = np.where(sides == 0, pairs[:, 1], pairs[:, 0])
+
+# run
+start = time.perf_counter()
+stats = voter_stats(user_ids, upvoted, downvoted, sides, timestamps)
+trust = stats.trust
+elapsed = time.perf_counter() - start
+
+print(f'{len(user_ids)} votes from {len(stats.voters)} voters in {elapsed * 1000:.1f} ms')
+flagged = stats.flagged()
+spammers = set(range(N, N + SPAMMERS))
+print(f'flagged {len(flagged)} voters, {len(spammers & set(flagged))}/{SPAMMERS} spammers')
+print(f'mean trust: careful voters {trust[stats.voters < N].mean():.3f}, spammers {trust[stats.voters >= N].mean():.3f}')
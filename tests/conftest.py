@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+# project imports
+import db
+import registry
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    A fresh SQLite database with every table created, swapped in for the bot's own.
+    """
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setattr(db, 'engine', engine)
+    monkeypatch.setattr(db, 'session', async_sessionmaker(engine, expire_on_commit=False))
+
+    import ibdp_twow.tables  # registers the preset tables
+    asyncio.run(db.init())
+    yield engine
+    asyncio.run(engine.dispose())
+    for channel_id, _ in registry.twows.items():
+        registry.twows.remove(channel_id)
@@ -0,0 +1,60 @@
+"""
+Minimal stand-ins for the Discord objects the bot talks to, recording what was sent.
+"""
+import itertools
+
+
+_ids = itertools.count(1000)
+
+
+class Message:
+
+    def __init__(self, content, view=None):
+        self.id = next(_ids)
+        self.content = content
+        self.view = view
+
+
+class Thread:
+
+    def __init__(self, name):
+        self.id = next(_ids)
+        self.name = name
+        self.sent = []
+
+    async def send(self, content, **kwargs):
+        self.sent.append(content)
+        return Message(content)
+
+
+class Guild:
+
+    def __init__(self, id):
+        self.id = id
+        self.name = f'guild {id}'
+        self.threads = {}
+
+    def get_channel_or_thread(self, id):
+        return self.threads.get(id)
+
+    async def fetch_channel(self, id):
+        return self.threads[id]
+
+
+class TextChannel:
+
+    def __init__(self, id, guild):
+        self.id = id
+        self.name = f'channel {id}'
+        self.guild = guild
+        self.sent = []
+
+    async def send(self, content, view=None, **kwargs):
+        message = Message(content, view)
+        self.sent.append(message)
+        return message
+
+    async def create_thread(self, name, **kwargs):
+        thread = Thread(name)
+        self.guild.threads[thread.id] = thread
+        return thread
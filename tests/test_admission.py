@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from utils.admission import AdmissionController, Overloaded
+
+
+def test_requests_that_cannot_defer_are_shed_instead_of_queued():
+    async def run():
+        admission = AdmissionController(limit=1, defer_depth=2, max_depth=4)
+        release = asyncio.Event()
+        deferred = []
+
+        async def hold(defer=None):
+            async with admission.admit('twow', defer=defer):
+                await release.wait()
+
+        async def defer():
+            deferred.append(True)
+
+        held = [asyncio.create_task(hold()), asyncio.create_task(hold()), asyncio.create_task(hold())]
+        await asyncio.sleep(0)
+        assert admission.depth('twow') == 2  # one admitted, two queued
+
+        with pytest.raises(Overloaded):
+            async with admission.admit('twow'):
+                pass
+        queued = asyncio.create_task(hold(defer))
+        await asyncio.sleep(0)
+        assert deferred == [True]
+
+        release.set()
+        await asyncio.gather(*held, queued)
+        return admission.metrics
+
+    metrics = asyncio.run(run())
+    assert metrics['shed'] == 1 and metrics['admitted'] == 4
@@ -0,0 +1,43 @@
+import asyncio
+
+# project imports
+import db
+from ibdp_twow import archive
+from ibdp_twow.tables import Participant, Response, Vote
+
+
+async def season(twow_id, contents, deleted=()):
+    async with db.session() as session, session.begin():
+        responses = []
+        for user_id, content in enumerate(contents, start=1):
+            session.add(Participant(twow_id=twow_id, user_id=user_id))
+            responses.append(Response(twow_id=twow_id, user_id=user_id, round=1, content=content, deleted=content in deleted))
+        session.add_all(responses)
+        await session.flush()
+        for upvoted, downvoted in zip(responses, responses[1:]):
+            session.add(Vote(twow_id=twow_id, user_id=9, round=1, upvoted_id=upvoted.id, downvoted_id=downvoted.id))
+
+
+async def votes_by_content(twow_id):
+    async with db.session() as session:
+        responses = dict((await session.execute(db.select(Response.id, Response.content).where(Response.twow_id == twow_id))).all())
+        votes = (await session.execute(db.select(Vote.upvoted_id, Vote.downvoted_id).where(Vote.twow_id == twow_id).order_by(Vote.id))).all()
+    return [(responses[upvoted_id], responses[downvoted_id]) for upvoted_id, downvoted_id in votes]
+
+
+def test_restore_after_a_new_season_reused_the_ids(database, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(tmp_path / 'archives'))
+
+    async def run():
+        await season(1, ['a', 'b', 'c', 'gone'], deleted={'gone'})
+        dumped = await archive.dump(1)
+        await season(2, ['x', 'y', 'z'])  # the latest season's rows were freed, so these get the same ids
+        restored = await archive.restore(1)
+        return dumped, restored, await votes_by_content(1), await votes_by_content(2)
+
+    dumped, restored, first, second = asyncio.run(run())
+    assert dumped == {'ib_participants': 4, 'ib_responses': 3, 'ib_votes': 3}
+    assert restored == {'ib_participants': 4, 'ib_responses': 3, 'ib_votes': 2}  # the vote for the deleted response is dropped
+    assert first == [('a', 'b'), ('b', 'c')]
+    assert second == [('x', 'y'), ('y', 'z')]
+    assert not archive.exists(1)
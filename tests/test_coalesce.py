@@ -0,0 +1,52 @@
+import gc
+import asyncio
+
+from utils.coalesce import Coalescer, merge_non_null
+
+
+def test_submissions_during_a_write_are_merged_into_the_next():
+    async def run():
+        writes = []
+        release = asyncio.Event()
+
+        async def write(key, value):
+            writes.append((key, value))
+            await release.wait()
+            return value
+
+        coalescer = Coalescer(write, merge=merge_non_null)
+        first = asyncio.create_task(coalescer.submit('user', {'moniker': 'a', 'content': None}))
+        await asyncio.sleep(0)
+        later = [
+            asyncio.create_task(coalescer.submit('user', {'moniker': 'b', 'content': None})),
+            asyncio.create_task(coalescer.submit('user', {'moniker': None, 'content': 'text'})),
+        ]
+        other = asyncio.create_task(coalescer.submit('other user', {'moniker': 'c', 'content': None}))
+        await asyncio.sleep(0)
+        gc.collect()  # in-flight flushes are referenced by the coalescer
+        release.set()
+        return writes, await first, await asyncio.gather(*later), await other
+
+    writes, first, later, other = asyncio.run(run())
+    assert writes == [
+        ('user', {'moniker': 'a', 'content': None}),
+        ('other user', {'moniker': 'c', 'content': None}),
+        ('user', {'moniker': 'b', 'content': 'text'}),
+    ]
+    assert first == writes[0][1] and other == writes[1][1]
+    assert later == [writes[2][1]] * 2  # both receive the result of the write that included them
+
+
+def test_write_errors_reach_every_merged_submitter():
+    async def run():
+        async def write(key, value):
+            await asyncio.sleep(0)
+            raise ValueError(value)
+
+        coalescer = Coalescer(write)
+        first = asyncio.create_task(coalescer.submit('key', 0))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(first, *(coalescer.submit('key', value) for value in (1, 2)), return_exceptions=True)
+        return [str(result) for result in results]
+
+    assert asyncio.run(run()) == ['0', '2', '2']  # the first write started alone, the others were merged into one
@@ -0,0 +1,28 @@
+import asyncio
+
+# project imports
+import db
+from ibdp_twow.tables import Response, Vote, compact
+
+
+def test_compact_purges_only_deleted_rows(database):
+    async def run():
+        async with db.session() as session, session.begin():
+            live = Response(twow_id=1, user_id=1, round=1, content='live')
+            gone = Response(twow_id=1, user_id=2, round=1, content='gone', deleted=True)
+            session.add_all([live, gone])
+            await session.flush()
+            session.add_all([
+                Vote(twow_id=1, user_id=3, round=1, upvoted_id=live.id, downvoted_id=gone.id),
+                Vote(twow_id=1, user_id=3, round=1, upvoted_id=live.id, downvoted_id=live.id),
+            ])
+        purged = await compact()
+        async with db.session() as session:
+            responses = (await session.scalars(db.select(Response.content))).all()
+            votes = (await session.scalars(db.select(Vote))).all()
+        return purged, responses, votes
+
+    purged, responses, votes = asyncio.run(run())
+    assert purged == {'ib_responses': 1, 'ib_participants': 0}
+    assert responses == ['live']
+    assert len(votes) == 1  # the vote for the purged response went with it
@@ -0,0 +1,48 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+# project imports
+import db
+from db import Twow, TwowChannel
+from ibdp_twow.tables import Participant
+
+
+# tables as created by the first release
+OLD_SCHEMA = [
+    'CREATE TABLE channels (id INTEGER NOT NULL, host_id INTEGER, current_twow_id INTEGER, PRIMARY KEY (id))',
+    'CREATE TABLE twows (id INTEGER NOT NULL, guild_id INTEGER, channel_id INTEGER, private_channel_id INTEGER, '
+    'current_message_id INTEGER, current_round INTEGER, state VARCHAR(11), start_timestamp DATETIME, PRIMARY KEY (id))',
+    'CREATE TABLE ib_participants (id INTEGER NOT NULL, twow_id INTEGER, user_id INTEGER, moniker VARCHAR(32), '
+    'score INTEGER, PRIMARY KEY (id))',
+    "INSERT INTO channels VALUES (5, 1, 1)",
+    "INSERT INTO twows VALUES (1, 1, 5, NULL, NULL, 2, 'IDLE', NULL)",
+    "INSERT INTO ib_participants VALUES (1, 1, 7, NULL, 0), (2, 1, 7, NULL, 0)",
+]
+
+
+def test_init_upgrades_old_database(tmp_path, monkeypatch):
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "old.db"}')
+    monkeypatch.setattr(db, 'engine', engine)
+    monkeypatch.setattr(db, 'session', async_sessionmaker(engine, expire_on_commit=False))
+
+    async def run():
+        async with engine.begin() as conn:
+            for statement in OLD_SCHEMA:
+                await conn.exec_driver_sql(statement)
+        await db.init()
+        await db.init()  # idempotent
+
+        async with db.session() as session, session.begin():
+            twow = (await session.scalars(db.select(Twow))).one()
+            channels = (await session.scalars(db.select(TwowChannel).where(TwowChannel.deleted.is_(False)))).all()
+            participant = await Participant.upsert(session, twow_id=1, user_id=7, moniker='moniker')
+            participants = (await session.scalars(db.select(Participant))).all()
+        await engine.dispose()
+        return twow, channels, participant, participants
+
+    twow, channels, participant, participants = asyncio.run(run())
+    assert twow.deadline is None
+    assert [channel.id for channel in channels] == [5]  # backfilled as not deleted
+    assert participant.moniker == 'moniker' and not participant.deleted
+    assert len(participants) == 1  # duplicates removed, upserts work
@@ -0,0 +1,49 @@
+import asyncio
+
+# project imports
+import db
+import registry
+from db import Twow, TwowChannel, TwowState
+from ibdp_twow.host import HostThreads
+
+from fakes import Guild, TextChannel
+
+
+async def running_twow(channel_id=5, guild_id=1, host_id=None):
+    async with db.session() as session, session.begin():
+        session.add(TwowChannel(id=channel_id, host_id=host_id))
+        twow = Twow(guild_id=guild_id, channel_id=channel_id, state=TwowState.RESPONDING)
+        session.add(twow)
+    registry.twows.publish(channel_id, twow)
+    return twow
+
+
+def test_creating_the_thread_keeps_the_version(database):
+    async def run():
+        twow = await running_twow(host_id=9)
+        version = registry.twows.version(5)
+        channel = TextChannel(5, Guild(1))
+        thread = await HostThreads().get(twow.id, channel)
+        stored = await db.fetch_by_id(Twow, twow.id)
+        return thread, version, stored
+
+    thread, version, stored = asyncio.run(run())
+    registry.twows.check(5, version)  # a command that read the state before the thread existed is not stale
+    assert stored.private_channel_id == thread.id
+    assert registry.twows.get(5).private_channel_id == thread.id
+    assert thread.sent == ['<@&9>']
+
+
+def test_existing_thread_is_only_read(database):
+    async def run():
+        twow = await running_twow()
+        channel = TextChannel(5, Guild(1))
+        created = await HostThreads().get(twow.id, channel)
+        version = registry.twows.version(5)
+        async with registry.twows.lock(5):  # e.g. a transition in progress
+            found = await asyncio.wait_for(HostThreads().get(twow.id, channel), 1)
+        return created, found, version
+
+    created, found, version = asyncio.run(run())
+    assert found is created
+    registry.twows.check(5, version)
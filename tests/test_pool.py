@@ -0,0 +1,21 @@
+import asyncio
+
+# project imports
+import db
+import pool
+from db import Prompt
+
+
+def test_backfill_brings_old_prompts_into_the_pool(database):
+    async def run():
+        async with db.session() as session, session.begin():
+            session.add(Prompt(user_id=1, content='What is the best way to spend a rainy afternoon?'))
+        await pool.backfill(legacy_guild_id=42)
+        await pool.backfill(legacy_guild_id=42)  # idempotent
+        prompt, duplicate = await pool.add(2, 42, 'What is the best way to spend a rainy afternoon')
+        prompts, _ = await pool.search(42, 'rainy')
+        return prompt, duplicate, prompts
+
+    prompt, duplicate, prompts = asyncio.run(run())
+    assert prompt is None and duplicate.user_id == 1
+    assert [found.user_id for found in prompts] == [1]
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils import ratelimit
+from utils.ratelimit import RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=0.)
+    monkeypatch.setattr(ratelimit, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_burst_then_rate(clock):
+    limiter = RateLimiter(rate=1., capacity=3.)
+    assert [limiter.allow('twow', 'user') for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow('twow', 'other')  # buckets are per key
+    assert limiter.retry_after('twow', 'user') == pytest.approx(1.)
+
+    clock.now = .5
+    assert not limiter.allow('twow', 'user')
+    assert limiter.retry_after('twow', 'user') == pytest.approx(.5)
+    clock.now = 1.
+    assert limiter.allow('twow', 'user')
+    assert limiter.retry_after('twow', 'unknown') == 0.
+    assert limiter.metrics == {'allowed': 5, 'limited': 2}
+
+
+def test_sweep_and_discard(clock):
+    limiter = RateLimiter(rate=1., capacity=2., sweep_interval=10.)
+    limiter.allow('twow', 'idle')
+    limiter.allow('other twow', 'user')
+    clock.now = 10.
+    limiter.allow('twow', 'active')
+    assert set(limiter._shards['twow']) == {'active'}  # refilled buckets are swept
+
+    limiter.discard('other twow')
+    assert 'other twow' not in limiter._shards and 'other twow' not in limiter._swept
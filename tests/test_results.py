@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+# project imports
+import db
+from db import Twow, TwowState
+from ibdp_twow import results, tally
+from ibdp_twow.tables import Participant, Response, Vote
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(tally, '_tallies', {})
+    monkeypatch.setattr(results, '_scored', {})
+
+
+def play_round(n_responses: int, votes: list[tuple[int, int, int]]):
+    """
+    A TWOW in round 1 with `n_responses` responses from users 0, 1, ... and votes (voter, upvoted user, downvoted user).
+    Every voter is a participant, even without a response.
+    Returns the TWOW and its response ids by user.
+    """
+    async def setup():
+        async with db.session() as session, session.begin():
+            twow = Twow(guild_id=1, channel_id=None, state=TwowState.IDLE, current_round=1)
+            session.add(twow)
+            await session.flush()
+            responses = {}
+            for user_id in range(n_responses):
+                session.add(Participant(twow_id=twow.id, user_id=user_id))
+                response = Response(twow_id=twow.id, user_id=user_id, round=1, content=f'response {user_id}')
+                session.add(response)
+                responses[user_id] = response
+            for user_id in {voter for voter, _, _ in votes} - set(responses):
+                session.add(Participant(twow_id=twow.id, user_id=user_id))
+            await session.flush()
+            for voter, upvoted, downvoted in votes:
+                session.add(Vote(
+                    twow_id=twow.id, user_id=voter, round=1,
+                    upvoted_id=responses[upvoted].id, downvoted_id=responses[downvoted].id, side=0
+                ))
+        return twow, {user_id: response.id for user_id, response in responses.items()}
+    return asyncio.run(setup())
+
+
+def scores(twow: Twow):
+    async def fetch():
+        async with db.session() as session:
+            stmt = db.select(Response.user_id, Response.score).where(Response.twow_id == twow.id)
+            response_scores = dict((await session.execute(stmt)).all())
+            stmt = db.select(Participant.user_id, Participant.score).where(Participant.twow_id == twow.id)
+            totals = dict((await session.execute(stmt)).all())
+        return response_scores, totals
+    return asyncio.run(fetch())
+
+
+def test_two_response_round(database):
+    twow, _ = play_round(2, [(5, 1, 0)])
+    asyncio.run(results.update(twow))
+    response_scores, totals = scores(twow)
+    assert response_scores == {0: 1, 1: 7}
+    assert totals == {0: 1, 1: 7, 5: 1}  # a missed round counts as its lowest score
+
+
+def test_unvoted_responses_tie(database):
+    twow, _ = play_round(4, [(5, 0, 1)])
+    asyncio.run(results.update(twow))
+    response_scores, _ = scores(twow)
+    assert response_scores == {0: 7, 1: 1, 2: 4, 3: 4}
+
+
+def test_recalculate_forces_recompute(database):
+    twow, _ = play_round(2, [(5, 1, 0)])
+    asyncio.run(results.update(twow))
+
+    async def tamper():
+        async with db.session() as session, session.begin():
+            await session.execute(db.update(Response).where(Response.twow_id == twow.id).values(score=0))
+    asyncio.run(tamper())
+
+    asyncio.run(results.update(twow))
+    assert scores(twow)[0] == {0: 0, 1: 0}  # unchanged tally, cached
+    asyncio.run(results.update(twow, force=True))
+    assert scores(twow)[0] == {0: 1, 1: 7}
@@ -0,0 +1,35 @@
+from utils.scoring import ScoreBands, band_scores
+
+
+SUBJECT = ScoreBands.equal(range(1, 8))
+CORE = ScoreBands.equal(range(0, 4))
+
+
+def test_empty_round():
+    assert band_scores([], SUBJECT).tolist() == []
+
+
+def test_lone_response_wins():
+    assert band_scores([1000.], SUBJECT).tolist() == [7]
+    assert band_scores([1000.], CORE).tolist() == [3]
+
+
+def test_small_rounds_span_every_extreme():
+    assert band_scores([900., 1100.], SUBJECT).tolist() == [1, 7]
+    assert band_scores([1., 2., 3., 4., 5.], SUBJECT).tolist() == [1, 2, 4, 6, 7]
+    assert band_scores([3., 1., 2.], CORE).tolist() == [3, 0, 2]
+
+
+def test_full_round_uses_every_band():
+    assert band_scores(range(7), SUBJECT).tolist() == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_ties_share_their_average_rank():
+    assert band_scores([5., 5., 5.], SUBJECT).tolist() == [4, 4, 4]
+    assert band_scores([1., 2., 2., 3.], SUBJECT).tolist() == [1, 4, 4, 7]
+
+
+def test_ties_do_not_depend_on_order():
+    ratings = [1000., 1200., 1000., 800., 1200.]
+    scores = dict(zip(ratings, band_scores(ratings, SUBJECT).tolist()))
+    assert band_scores(list(reversed(ratings)), SUBJECT).tolist() == [scores[rating] for rating in reversed(ratings)]
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# project imports
+import db
+import transfer
+from ibdp_twow.tables import Response
+
+
+@pytest.mark.parametrize('format', transfer.FORMATS)
+def test_export_load_round_trip(database, tmp_path, format):
+    async def run():
+        async with db.session() as session, session.begin():
+            session.add_all([
+                db.Twow(guild_id=1, channel_id=2, state=db.TwowState.VOTING),
+                Response(twow_id=1, user_id=1, round=1, content='kept, with "quotes"'),
+                Response(twow_id=1, user_id=2, round=1, content='gone', deleted=True),
+            ])
+        exported = await transfer.export(str(tmp_path / 'export'), format)
+
+        target = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "target.db"}')
+        loaded = await transfer.load(str(tmp_path / 'export'), format, target)
+        async with target.connect() as conn:
+            twows = (await conn.execute(db.select(db.Twow.state))).all()
+            responses = (await conn.execute(db.select(Response.content, Response.deleted).order_by(Response.id))).all()
+        await target.dispose()
+        return exported, loaded, twows, responses
+
+    exported, loaded, twows, responses = asyncio.run(run())
+    assert loaded == exported
+    assert twows == [(db.TwowState.VOTING,)]
+    assert responses == [('kept, with "quotes"', False), ('gone', True)]
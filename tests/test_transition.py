@@ -0,0 +1,61 @@
+import sys
+import asyncio
+import importlib
+
+import pytest
+
+# project imports
+import db
+import registry
+from db import Twow, TwowChannel, TwowState
+from ibdp_twow.tables import Response
+from utils.text import normalize
+
+from fakes import Guild, TextChannel
+
+
+CONFIG = """
+[game]
+preset = ibdp_twow
+[test server]
+id = 1
+"""
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch, database):
+    (tmp_path / 'config.ini').write_text(CONFIG)
+    monkeypatch.setattr(sys, 'argv', ['bot.py', str(tmp_path / 'config.ini')])
+    sys.modules.pop('bot', None)
+    bot = importlib.import_module('bot')
+    yield bot
+    sys.modules.pop('bot', None)
+
+
+def test_voting_opens_when_the_duplicate_report_creates_the_host_thread(bot):
+    async def run():
+        bot.client.scheduler = bot.Scheduler(bot.on_deadline)
+        async with db.session() as session, session.begin():
+            session.add(TwowChannel(id=5, host_id=9))
+            twow = Twow(guild_id=1, channel_id=5, current_round=1, state=TwowState.RESPONDING)
+            session.add(twow)
+            await session.flush()
+            for user_id, raw in enumerate(['The same answer!', 'the same answer', 'Something else entirely'], start=1):
+                content = normalize(raw)
+                session.add(Response(
+                    twow_id=twow.id, user_id=user_id, round=1,
+                    content=content.content, word_count=content.word_count, content_hash=content.content_hash
+                ))
+        version = registry.twows.publish(5, twow)
+
+        channel = TextChannel(5, Guild(1))
+        opened = await bot.transition(channel, version, TwowState.VOTING, bot.vote_message, bot.vote_db_update)
+        return channel, opened
+
+    channel, opened = asyncio.run(run())
+    assert opened.state == TwowState.VOTING
+    assert registry.twows.get(5).state == TwowState.VOTING
+    assert [message.content for message in channel.sent] == ['Round 1 voting is open!']
+    (thread,) = [thread for thread in channel.guild.threads.values()]
+    assert thread.sent[0] == '<@&9>'
+    assert 'Possible duplicate responses' in thread.sent[1] and len(thread.sent) == 2
@@ -0,0 +1,34 @@
+import asyncio
+from types import SimpleNamespace
+
+# project imports
+import registry
+from db import Twow, TwowState
+from ibdp_twow.prompt import SubmissionView
+from ibdp_twow.signup import SignUpView
+
+
+def click(view_cls, twow_id, message_id, channel_id=5):
+    interaction = SimpleNamespace(
+        channel_id=channel_id,
+        data={'custom_id': f'{view_cls.__name__}:button:{twow_id}'},
+        message=SimpleNamespace(id=message_id)
+    )
+
+    async def run():
+        return view_cls().resolve(interaction)
+    return asyncio.run(run())
+
+
+def test_old_messages_do_not_act_on_the_current_twow():
+    registry.twows.publish(5, Twow(id=1, channel_id=5, current_round=2, state=TwowState.RESPONDING, current_message_id=20))
+    try:
+        assert click(SubmissionView, 1, 20) is registry.twows.get(5)
+        assert click(SubmissionView, 1, 10) is None  # submission message of round 1
+        assert click(SignUpView, 1, 1) is None  # sign-up message, mid-season
+        assert click(SubmissionView, 2, 20) is None  # another TWOW
+
+        registry.twows.publish(5, Twow(id=1, channel_id=5, current_round=2, state=TwowState.VOTING, current_message_id=30))
+        assert click(SubmissionView, 1, 20) is None  # round 2 submissions closed
+    finally:
+        registry.twows.remove(5)
@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+# project imports
+from ibdp_twow import vote
+
+
+RESPONSES = [SimpleNamespace(id=id) for id in range(1, 5)]  # 6 possible pairs
+
+
+def ids(pair):
+    return (pair[0].id, pair[1].id)
+
+
+def shown(twow, user_id=1, history=()):
+    """
+    Pair shown by formatted_options, which starts prefetching the ballots after it.
+    """
+    pair = vote.choose_pair(RESPONSES, list(history))
+    vote.prefetch(twow, user_id, RESPONSES, list(history) + [ids(pair)])
+    return ids(pair)
+
+
+def test_prefetched_ballot_follows_the_vote_on_the_shown_pair():
+    async def run():
+        twow = SimpleNamespace(id=1, current_round=1)
+        history = [shown(twow)]
+        pairs = []
+        while (pair := await vote.next_ballot(twow, 1, history)) is not None:
+            pairs.append(ids(pair))
+            history.append(ids(pair))  # voting on each prefetched ballot in turn
+        return history, pairs
+
+    history, pairs = asyncio.run(run())
+    assert len(pairs) == 5  # every remaining pair was served from the prefetch
+    assert len({frozenset(pair) for pair in history}) == 6
+    assert vote.choose_pair(RESPONSES, history) is None
+    assert (1, 1) not in vote._prefetched  # exhausted
+
+
+def test_vote_on_an_older_ballot_misses():
+    async def run():
+        twow = SimpleNamespace(id=2, current_round=1)
+        first = shown(twow)
+        second = shown(twow, history=[first])  # the voter asked for a new ballot, then voted on the first one
+        return await vote.next_ballot(twow, 1, [second, first])
+
+    assert asyncio.run(run()) is None
+    assert (2, 1) not in vote._prefetched
+
+
+def test_round_change_misses():
+    async def run():
+        twow = SimpleNamespace(id=3, current_round=1)
+        history = [shown(twow)]
+        return await vote.next_ballot(SimpleNamespace(id=3, current_round=2), 1, history)
+
+    assert asyncio.run(run()) is None
+
+
+def test_dropped_after_a_response_is_deleted():
+    async def run():
+        twow, other = SimpleNamespace(id=4, current_round=1), SimpleNamespace(id=5, current_round=1)
+        history, other_history = [shown(twow)], [shown(other)]
+        vote.drop_prefetched(twow.id)
+        return await vote.next_ballot(twow, 1, history), await vote.next_ballot(other, 1, other_history)
+
+    dropped, kept = asyncio.run(run())
+    assert dropped is None
+    assert kept is not None  # other TWOWs keep theirs
+    vote.drop_prefetched(5)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from utils.vote_quality import LEFT, RIGHT, MIN_RATE_VOTES, voter_stats
+
+
+def test_few_quick_votes_are_not_fast():
+    stats = voter_stats([1, 1], [10, 11], [11, 12], [LEFT, RIGHT], [0., 2.])
+    assert not stats.fast.any()
+    assert stats.trust.tolist() == [1.]
+
+
+def test_many_quick_votes_are_fast():
+    n = MIN_RATE_VOTES
+    stats = voter_stats([1] * n, [10] * n, [11] * n, [LEFT, RIGHT] * (n // 2), np.linspace(0., 5., n))
+    assert stats.fast.tolist() == [True]
+    assert stats.trust[0] < 1
+
+
+def test_untimed_votes_are_not_fast():
+    n = 2 * MIN_RATE_VOTES
+    stats = voter_stats([1] * n, [10] * n, [11] * n, [-1] * n, [np.nan] * n)
+    assert not stats.fast.any()
+    assert np.isnan(stats.left_fraction[0])
+
+
+def test_agreement_leaves_own_votes_out():
+    # voter 1 is the only one to see responses 12 and 13, so there is no consensus to agree with
+    # voters 2 and 3 both prefer 10 over 11, and agree with each other
+    stats = voter_stats([1, 2, 3], [12, 10, 10], [13, 11, 11], [LEFT] * 3, [0., 0., 0.])
+    assert stats.agreement.tolist() == [.5, 1., 1.]
+
+
+def test_contrarian_voter():
+    # voters 1 to 4 agree on a ranking of responses 0 to 9, voter 5 always votes the other way
+    pairs = [(a, b) for a in range(10) for b in range(a + 1, 10)]
+    user_ids, upvoted, downvoted = [], [], []
+    for voter in range(1, 6):
+        for a, b in pairs:
+            user_ids.append(voter)
+            upvoted.append(b if voter == 5 else a)
+            downvoted.append(a if voter == 5 else b)
+    sides = [i % 2 for i in range(len(user_ids))]
+    stats = voter_stats(user_ids, upvoted, downvoted, sides, [np.nan] * len(user_ids))
+    assert stats.contrarian.tolist() == [False, False, False, False, True]
+    assert stats.agreement[4] == 0.
@@ -0,0 +1,169 @@
+import os
+import csv
+import asyncio
+import itertools
+import json
+import enum
+import datetime
+import argparse
+
+# dependency imports
+from sqlalchemy import Boolean, DateTime, Enum, Float, Integer
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# project imports
+import db
+import presets
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+
+BATCH_SIZE = 1000
+FORMATS = ['jsonl', 'csv']
+
+
+def _encode(value):
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode(column, value):
+    if value is None or value == '':
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.datetime.fromisoformat(value)
+    if isinstance(column.type, Enum):
+        return column.type.enum_class[value]
+    if isinstance(column.type, Boolean):
+        return value if isinstance(value, bool) else value in ('True', 'true', '1')  # csv has no booleans
+    if isinstance(column.type, Float):
+        return float(value)
+    if isinstance(column.type, Integer) or column.foreign_keys:
+        return int(value)
+    return value
+
+
+class _JsonlWriter:
+
+    def __init__(self, file, columns):
+        self.file = file
+        self.names = [column.name for column in columns]
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(dict(zip(self.names, map(_encode, row)))) + '\n')
+
+
+class _CsvWriter:
+
+    def __init__(self, file, columns):
+        self.writer = csv.writer(file)
+        self.writer.writerow([column.name for column in columns])
+
+    def write(self, rows):
+        self.writer.writerows([['' if value is None else _encode(value) for value in row] for row in rows])
+
+
+def _read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def _read_batch(table, records):
+    return [
+        {name: _decode(table.columns[name], value) for name, value in record.items() if name in table.columns}
+        for record in itertools.islice(records, BATCH_SIZE)
+    ]
+
+
+async def export(directory: str, format: str = 'jsonl', engine=None):
+    """
+    Stream every table into `<directory>/<table>.<format>`.
+    All tables are read inside one read transaction, so the export is a consistent snapshot.
+    """
+    engine = engine or db.engine
+    await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+    writer_cls = {'jsonl': _JsonlWriter, 'csv': _CsvWriter}[format]
+
+    counts = {}
+    async with engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            await conn.exec_driver_sql('BEGIN')  # sqlite does not start a transaction for plain reads otherwise
+        for table in db.Base.metadata.sorted_tables:
+            columns = list(table.columns)
+            # file i/o runs in a thread, so exporting a large database does not stall the bot's event loop
+            file = await asyncio.to_thread(open, os.path.join(directory, f'{table.name}.{format}'), 'w', newline='', encoding='utf-8')
+            try:
+                writer = await asyncio.to_thread(writer_cls, file, columns)
+                result = await conn.stream(db.select(*columns).order_by(*table.primary_key.columns))
+                counts[table.name] = 0
+                async for rows in result.partitions(BATCH_SIZE):
+                    await asyncio.to_thread(writer.write, rows)
+                    counts[table.name] += len(rows)
+            finally:
+                await asyncio.to_thread(file.close)
+        await conn.rollback()
+
+    logger.info(f'Exported {sum(counts.values())} rows to {directory}: {counts}')
+    return counts
+
+
+async def load(directory: str, format: str = 'jsonl', engine=None):
+    """
+    Stream every exported table from `directory` back into the database with batched inserts.
+    Target tables are expected to be empty.
+    """
+    engine = engine or db.engine
+    reader = {'jsonl': _read_jsonl, 'csv': _read_csv}[format]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(db.Base.metadata.create_all)
+
+    counts = {}
+    async with engine.begin() as conn:
+        for table in db.Base.metadata.sorted_tables:
+            path = os.path.join(directory, f'{table.name}.{format}')
+            if not await asyncio.to_thread(os.path.exists, path):
+                logger.warning(f'No export found for table {table.name}, skipping.')
+                continue
+
+            counts[table.name] = 0
+            file = await asyncio.to_thread(open, path, newline='', encoding='utf-8')
+            try:
+                records = reader(file)
+                while batch := await asyncio.to_thread(_read_batch, table, records):
+                    await conn.execute(db.insert(table), batch)
+                    counts[table.name] += len(batch)
+            finally:
+                await asyncio.to_thread(file.close)
+
+    logger.info(f'Imported {sum(counts.values())} rows from {directory}: {counts}')
+    return counts
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S', level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Export or import all TWOW data.')
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('directory', help='Directory to export to or import from.')
+    parser.add_argument('--format', choices=FORMATS, default='jsonl')
+    parser.add_argument('--database', default=None, help='SQLAlchemy URL of the database. (Defaults to the bot database.)')
+    args = parser.parse_args()
+
+    presets.import_tables()  # every preset's tables are included
+    engine = create_async_engine(args.database) if args.database else None
+    if args.action == 'export':
+        asyncio.run(export(args.directory, args.format, engine))
+    else:
+        asyncio.run(load(args.directory, args.format, engine))
@@ -0,0 +1,65 @@
+import asyncio
+import contextlib
+from collections import Counter, defaultdict
+from typing import Coroutine, Hashable, Optional
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdmissionController:
+    """
+    Bounds concurrent database work per key (e.g. per TWOW).
+    Callers beyond the concurrency limit wait in a queue. When the queue is deep, the optional `defer` coroutine is
+    awaited first (so Discord interactions are acknowledged in time), and when it is full the request is shed.
+    Requests that cannot be deferred (e.g. ones answered with a modal) are shed once the queue is that deep instead of
+    waiting past Discord's deadline.
+    """
+
+    def __init__(self, limit: int = 4, defer_depth: int = 4, max_depth: int = 64):
+        self.limit = limit
+        self.defer_depth = defer_depth
+        self.max_depth = max_depth
+        self.metrics = Counter()
+
+        self._semaphores: dict[Hashable, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.limit))
+        self._depth: Counter = Counter()
+
+    def __repr__(self):
+        return f'AdmissionController(limit={self.limit}, queued={sum(self._depth.values())}, metrics={dict(self.metrics)})'
+
+    def depth(self, key: Hashable):
+        return self._depth[key]
+
+    @contextlib.asynccontextmanager
+    async def admit(self, key: Hashable, defer: Optional[Coroutine] = None):
+        depth = self._depth[key]
+        if depth >= self.max_depth or (defer is None and depth >= self.defer_depth):
+            self.metrics['shed'] += 1
+            logger.warning(f'Shed request for {key} (queue depth {depth}).')
+            raise Overloaded(key)
+
+        semaphore = self._semaphores[key]
+        self._depth[key] += 1
+        self.metrics['peak_depth'] = max(self.metrics['peak_depth'], self._depth[key])
+        try:
+            if defer and depth >= self.defer_depth:
+                self.metrics['deferred'] += 1
+                await defer()
+            await semaphore.acquire()
+        finally:
+            self._depth[key] -= 1
+
+        self.metrics['admitted'] += 1
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+admission = AdmissionController()
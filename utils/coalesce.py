@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Callable, Coroutine, Hashable
+
+
+def merge_non_null(old: dict, new: dict):
+    """
+    Merge two submissions, keeping old values for fields the new submission leaves empty.
+    """
+    return {**old, **{name: value for name, value in new.items() if value is not None}}
+
+
+class Coalescer:
+    """
+    Coalesces writes per key. While a write for a key is in flight, further submissions for that key are merged
+    into a single pending value, which is written once the in-flight write finishes.
+    Every submitter receives the result of the write that included their submission.
+    """
+
+    def __init__(self, write: Coroutine, merge: Callable[[Any, Any], Any] = lambda old, new: new):
+        self._write = write
+        self._merge = merge
+        self._pending: dict[Hashable, tuple[Any, list[asyncio.Future]]] = {}
+        self._flushing: set[Hashable] = set()
+        self._tasks: set[asyncio.Task] = set()  # strong references, so flushes are not garbage-collected mid-write
+
+    async def submit(self, key: Hashable, value):
+        future = asyncio.get_running_loop().create_future()
+        if key in self._pending:
+            old, futures = self._pending[key]
+            self._pending[key] = (self._merge(old, value), futures + [future])
+        else:
+            self._pending[key] = (value, [future])
+
+        if key not in self._flushing:
+            self._flushing.add(key)
+            task = asyncio.create_task(self._flush(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return await future
+
+    async def _flush(self, key: Hashable):
+        try:
+            while key in self._pending:
+                value, futures = self._pending.pop(key)
+                try:
+                    result = await self._write(key, value)
+                except Exception as e:
+                    for future in futures:
+                        future.set_exception(e)
+                else:
+                    for future in futures:
+                        future.set_result(result)
+        finally:
+            self._flushing.discard(key)
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Callable, Coroutine
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+# project imports
+import db
+
+
+BATCH_SIZE = 500
+
+
+async def purge(cls, batch_size: int = BATCH_SIZE, dependents: list[Callable] = ()):
+    """
+    Hard-delete the soft-deleted rows of a table (with a `deleted` flag) in batches, one transaction each.
+    `dependents` build statements deleting rows that reference a batch of purged ids, run in the same transaction.
+    Returns the number of rows purged.
+    """
+    purged = 0
+    while True:
+        async with db.session() as session, session.begin():
+            stmt = db.select(cls.id).where(cls.deleted.is_(True)).limit(batch_size)
+            ids = (await session.scalars(stmt)).all()
+            if not ids:
+                break
+            # rows revived since the select (e.g. by signing up again) are kept, along with what references them
+            stmt = db.delete(cls).where(cls.id.in_(ids), cls.deleted.is_(True)).returning(cls.id)
+            ids = (await session.scalars(stmt)).all()
+            if ids:
+                for dependent in dependents:
+                    await session.execute(dependent(ids))
+        purged += len(ids)
+        await asyncio.sleep(0)  # let interactions through between batches
+    return purged
+
+
+class Compactor:
+    """
+    Periodically runs compaction jobs in the background. `jobs` returns the current jobs, coroutine functions
+    that return a dict of purged row counts.
+    """
+
+    def __init__(self, jobs: Callable[[], list[Callable[[], Coroutine]]], interval: float = 3600.):
+        self._jobs = jobs
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run(self):
+        """
+        Run every job once.
+        """
+        purged = {}
+        for job in self._jobs():
+            try:
+                purged.update(await job())
+            except Exception:
+                logger.exception(f'Compaction job {job} failed.')
+        if any(purged.values()):
+            logger.info(f'Compacted {purged}.')
+        return purged
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run()
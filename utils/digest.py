@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Coroutine, Hashable
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Digest:
+    """
+    Buffers items per key and hands them to `flush(key, items)` in batches, at most every `interval` seconds
+    or as soon as `max_items` are waiting. Flushes run in the background, and only one runs per key at a time.
+    """
+
+    def __init__(self, flush: Coroutine, interval: float = 30., max_items: int = 20):
+        self._flush = flush
+        self.interval = interval
+        self.max_items = max_items
+        self._buffers: dict[Hashable, list] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._flushing: dict[Hashable, asyncio.Task] = {}
+
+    def add(self, key: Hashable, item: Any):
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append(item)
+        if key in self._flushing:
+            return  # picked up once the running flush finishes
+        if len(buffer) >= self.max_items:
+            self._start(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.interval, self._start, key)
+
+    def _start(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        items = self._buffers.pop(key, [])
+        if items:
+            self._flushing[key] = asyncio.create_task(self._run(key, items))
+
+    async def _run(self, key: Hashable, items: list):
+        try:
+            await self._flush(key, items)
+        except Exception:
+            logger.exception(f'Failed to flush {len(items)} item(s) for {key}.')
+        finally:
+            del self._flushing[key]
+
+        buffer = self._buffers.get(key)
+        if buffer and len(buffer) >= self.max_items:
+            self._start(key)
+        elif buffer and key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.interval, self._start, key)
+
+    async def close(self):
+        """
+        Flush everything that is still buffered and wait for it.
+        """
+        while self._buffers or self._flushing:
+            for key in list(self._buffers):
+                if key not in self._flushing:
+                    self._start(key)
+            await asyncio.gather(*self._flushing.values(), return_exceptions=True)
@@ -0,0 +1,57 @@
+import re
+import hashlib
+
+import numpy as np
+
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band, candidates from roughly 50% similarity upwards
+WORD = re.compile(r'\w+')
+
+_rng = np.random.default_rng(20230601)
+_A = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)  # odd multipliers for multiply-shift hashing
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+
+
+def _hash(value: str):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little')
+
+
+def shingles(text: str, k: int = 2):
+    """
+    Lowercased word k-grams of a text (just the words if it is shorter than k words).
+    """
+    words = WORD.findall(text.lower())
+    if len(words) < k:
+        return set(words)
+    return {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def signature(shingle_set: set[str]):
+    """
+    MinHash signature (NUM_PERM uint32 values) of a set of shingles.
+    """
+    if not shingle_set:
+        return np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+    hashes = np.fromiter((_hash(shingle) for shingle in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    with np.errstate(over='ignore'):
+        permuted = (np.outer(hashes, _A) + _B) >> np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def bands(sig: np.ndarray):
+    """
+    LSH bucket keys of a signature, one signed 64-bit integer per band (so they fit an SQLite INTEGER).
+    """
+    rows = NUM_PERM // BANDS
+    return [
+        int.from_bytes(hashlib.blake2b(sig[i * rows:(i + 1) * rows].tobytes(), digest_size=8).digest(), 'little', signed=True)
+        for i in range(BANDS)
+    ]
+
+
+def similarity(sig1: np.ndarray, sig2: np.ndarray):
+    """
+    Estimated Jaccard similarity of the shingle sets behind two signatures.
+    """
+    return float(np.mean(sig1 == sig2))
@@ -9,4 +9,16 @@ def clumped(iterable, n):
                 if clump:
                     yield clump
                 return
-        yield clump
\ No newline at end of file
+        yield clump
+
+
+def chunked(lines: list[str], limit: int = 2000):
+    chunk = ''
+    for line in lines:
+        line = line[:limit]
+        if chunk and len(chunk) + len(line) + 1 > limit:
+            yield chunk
+            chunk = ''
+        chunk = f'{chunk}\n{line}' if chunk else line
+    if chunk:
+        yield chunk
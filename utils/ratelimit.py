@@ -0,0 +1,78 @@
+import time
+from collections import Counter
+from typing import Hashable
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+
+    def refill(self, now: float, rate: float, capacity: float):
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class RateLimiter:
+    """
+    In-memory token buckets per key, sharded (e.g. per TWOW) so a shard can be dropped at once.
+    Each key may burst `capacity` actions and then `rate` actions per second.
+    """
+
+    def __init__(self, rate: float = 1., capacity: float = 5., sweep_interval: float = 300.):
+        self.rate = rate
+        self.capacity = capacity
+        self.sweep_interval = sweep_interval
+        self.metrics = Counter()
+
+        self._shards: dict[Hashable, dict[Hashable, TokenBucket]] = {}
+        self._swept: dict[Hashable, float] = {}
+
+    def __repr__(self):
+        return f'RateLimiter(rate={self.rate}, capacity={self.capacity}, shards={len(self._shards)}, metrics={dict(self.metrics)})'
+
+    def allow(self, shard: Hashable, key: Hashable):
+        """
+        Take a token for `key` if one is available.
+        """
+        now = time.monotonic()
+        buckets = self._shards.setdefault(shard, {})
+        if now - self._swept.setdefault(shard, now) >= self.sweep_interval:
+            self._sweep(shard, now)
+
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(self.capacity, now)
+        else:
+            bucket.refill(now, self.rate, self.capacity)
+
+        if bucket.tokens < 1:
+            self.metrics['limited'] += 1
+            return False
+        bucket.tokens -= 1
+        self.metrics['allowed'] += 1
+        return True
+
+    def retry_after(self, shard: Hashable, key: Hashable):
+        """
+        Seconds until `key` has a token again.
+        """
+        bucket = self._shards.get(shard, {}).get(key)
+        if bucket is None:
+            return 0.
+        bucket.refill(time.monotonic(), self.rate, self.capacity)
+        return max(0., (1 - bucket.tokens) / self.rate)
+
+    def _sweep(self, shard: Hashable, now: float):
+        # a bucket that would have refilled completely is the same as no bucket
+        buckets = self._shards[shard]
+        idle = [key for key, bucket in buckets.items() if bucket.tokens + (now - bucket.updated) * self.rate >= self.capacity]
+        for key in idle:
+            del buckets[key]
+        self._swept[shard] = now
+
+    def discard(self, shard: Hashable):
+        self._shards.pop(shard, None)
+        self._swept.pop(shard, None)
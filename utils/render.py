@@ -0,0 +1,25 @@
+from typing import Callable, Hashable
+
+
+class RenderCache:
+    """
+    Rendered messages (embeds, texts) per key, only re-rendered once the version they were rendered at changes.
+    Cached values are shared between calls, so they must not be mutated.
+    """
+
+    def __init__(self):
+        self._cache: dict[Hashable, tuple[Hashable, object]] = {}
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, key: Hashable, version: Hashable, render: Callable):
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = render()
+        self._cache[key] = (version, value)
+        return value
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,78 @@
+import time
+import heapq
+import asyncio
+from typing import Coroutine, Hashable
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    Runs `callback(key)` once each key's deadline passes.
+    All deadlines share one heap and one task, which sleeps until the earliest deadline or until a new one is scheduled.
+    """
+
+    def __init__(self, callback: Coroutine):
+        self._callback = callback
+        self._heap: list[tuple[float, Hashable]] = []
+        self._deadlines: dict[Hashable, float] = {}  # latest deadline per key, older heap entries are skipped
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._running: set[asyncio.Task] = set()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, key: Hashable, when: float):
+        """
+        Set (or move) the deadline of a key, as a UNIX timestamp.
+        """
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, key))
+        self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._deadlines.pop(key, None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            # drop cancelled or rescheduled entries
+            while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            when, key = self._heap[0]
+            delay = when - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            task = asyncio.create_task(self._fire(key))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _fire(self, key: Hashable):
+        try:
+            await self._callback(key)
+        except Exception:
+            logger.exception(f'Scheduled callback for {key} failed.')
@@ -0,0 +1,43 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+class ScoreBands(NamedTuple):
+    """
+    Scores by percentile band. A response's percentile is its rank from the bottom over the number of other
+    responses (0 for the lowest, 1 for the highest, tied responses share their average rank), and it lands in the
+    band after the last cutoff that percentile reaches.
+    """
+    cutoffs: tuple[float, ...]  # ascending, in (0, 1)
+    scores: tuple[int, ...]  # one per band (one more than cutoffs), lowest band first
+
+    @classmethod
+    def equal(cls, scores):
+        """
+        Equally sized bands, e.g. `ScoreBands.equal(range(1, 8))` for scores 1 to 7.
+        """
+        scores = tuple(scores)
+        return cls(tuple(i / len(scores) for i in range(1, len(scores))), scores)
+
+    @property
+    def minimum(self):
+        return self.scores[0]
+
+
+def band_scores(ratings, bands: ScoreBands):
+    """
+    Score of each rating under a set of bands. Tied ratings always share a band, and in a round of two or more
+    responses the best one always gets the top score.
+    """
+    ratings = np.asarray(ratings, dtype=np.float64)
+    if not len(ratings):
+        return np.zeros(0, dtype=np.int64)
+    if len(ratings) == 1:
+        return np.full(1, bands.scores[-1], dtype=np.int64)  # a lone response wins its round
+    ranked = np.sort(ratings)
+    below = np.searchsorted(ranked, ratings, side='left')  # number of strictly lower ratings
+    not_above = np.searchsorted(ranked, ratings, side='right')  # number of lower or equal ratings
+    percentile = (below + not_above - 1) / 2 / (len(ratings) - 1)
+    band = np.searchsorted(np.asarray(bands.cutoffs, dtype=np.float64), percentile, side='right')
+    return np.asarray(bands.scores, dtype=np.int64)[band]
@@ -0,0 +1,32 @@
+import re
+import hashlib
+from typing import NamedTuple
+
+
+WHITESPACE = re.compile(r'\s+')
+WORD = re.compile(r'\w+')
+
+
+class Normalized(NamedTuple):
+    content: str  # whitespace collapsed to single spaces
+    word_count: int
+    content_hash: str  # ignores case, punctuation and spacing, for exact duplicate detection
+
+
+def clean(raw: str):
+    """
+    Collapse newlines and runs of whitespace into single spaces.
+    """
+    return WHITESPACE.sub(' ', raw).strip()
+
+
+def fingerprint(content: str):
+    return hashlib.blake2b(' '.join(WORD.findall(content.casefold())).encode(), digest_size=16).hexdigest()
+
+
+def normalize(raw: str):
+    """
+    Clean a submission and derive everything later stages need from it, once.
+    """
+    content = clean(raw)
+    return Normalized(content, len(content.split()), fingerprint(content))
@@ -1,10 +1,117 @@
+import asyncio
 from typing import Coroutine
 
 import discord
 
+# project imports
+import registry
+
+# logging setup
+import logging
+logger = logging.getLogger(__name__)
+
+
+def disabled(view: discord.ui.View):
+    """
+    Disable every item of a view and stop it, so it can be sent as a display-only template.
+    """
+    for item in view.children:
+        item.disabled = True
+    view.stop()
+    return view
+
+
+async def disable_message(channel: discord.abc.Messageable, message_id: int, view: discord.ui.View, retries: int = 3):
+    """
+    Swap a disabled view onto a message by ID (no fetch), retrying on HTTP errors.
+    """
+    message = channel.get_partial_message(message_id)
+    for attempt in range(retries):
+        try:
+            await message.edit(view=view)
+            return
+        except discord.NotFound:
+            logger.warning(f'Message {message_id} no longer exists, nothing to disable.')
+            return
+        except discord.HTTPException as e:
+            logger.warning(f'Disabling view on message {message_id} failed (attempt {attempt + 1}/{retries}): {e}')
+            await asyncio.sleep(2 ** attempt)
+
+
+class TwowView(discord.ui.View):
+    """
+    Persistent view of a TWOW state. Each custom ID carries the TWOW ID (e.g. `voting:vote:<twow_id>`), so a single
+    instance per class (registered with a Router) serves every channel. Callbacks look their TWOW up with `resolve`.
+    Subclasses set `state`, the TWOW state their message belongs to.
+    """
+
+    state = None
+
+    def __init__(self, twow=None):
+        super().__init__(timeout=None)
+        self.twow = twow
+        if twow is not None:
+            for item in self.children:
+                item.custom_id = f'{item.custom_id}:{twow.id}'
+            self.stop()  # rendered only; clicks are dispatched by the Router, not the view store
+
+    def resolve(self, interaction: discord.Interaction):
+        """
+        The running TWOW an interaction belongs to, or None if the message belongs to an older TWOW, state or round.
+        Disabling old messages is best-effort, so their buttons may still be clicked.
+        """
+        twow = registry.twows.get(interaction.channel_id)
+        _, _, twow_id = interaction.data.get('custom_id', '').rpartition(':')
+        if twow is None or (twow_id.isdigit() and twow.id != int(twow_id)):
+            return None
+        if twow.state != self.state:
+            return None
+        if interaction.message is not None and twow.current_message_id and interaction.message.id != twow.current_message_id:
+            return None  # the same state in an earlier round
+        return twow
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if self.resolve(interaction) is None:
+            await interaction.response.send_message('This TWOW has moved on since this message was sent.', ephemeral=True)
+            return False
+        return True
+
+
+class Router:
+    """
+    Dispatches component interactions to registered TwowView instances by custom ID (minus the TWOW ID suffix).
+    """
+
+    def __init__(self):
+        self._items: dict[tuple[str, str], discord.ui.Item] = {}
+
+    def register(self, view: discord.ui.View, namespace: str = ''):
+        """
+        Register the items of a view. Presets register under their own namespace, so their custom IDs may overlap.
+        """
+        for item in view.children:
+            self._items[namespace, item.custom_id] = item
+
+    async def dispatch(self, interaction: discord.Interaction, namespace: str = ''):
+        if interaction.type != discord.InteractionType.component:
+            return False
+        custom_id = interaction.data.get('custom_id', '')
+        prefix, _, twow_id = custom_id.rpartition(':')
+        item = self._items.get((namespace, prefix if twow_id.isdigit() else custom_id))  # messages sent before TWOW IDs were added
+        if item is None:
+            return False
+
+        view = item.view
+        try:
+            if await view.interaction_check(interaction):
+                await item.callback(interaction)
+        except Exception as e:
+            await view.on_error(interaction, e, item)
+        return True
+
 
 class EmptyView(discord.ui.View):
-    def __init__(self, twow):
+    def __init__(self, twow=None):
         super().__init__(timeout=None)
         self.twow = twow
 
@@ -30,4 +137,70 @@ class ConfirmationView(discord.ui.View):
         style = discord.ButtonStyle.red
     )
     async def no(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self._no(interaction)
\ No newline at end of file
+        await self._no(interaction)
+
+
+class PageView(discord.ui.View):
+
+    def __init__(self, fetch_page: Coroutine, page: int, pages: int):
+        super().__init__(timeout=300)
+        self._fetch_page = fetch_page
+        self.page = page
+        self.pages = pages
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.previous.disabled = self.page <= 1
+        self.next.disabled = self.page >= self.pages
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        self.page = page
+        self._update_buttons()
+        content = await self._fetch_page(page)
+        await interaction.response.edit_message(content=content, view=self)
+
+    @discord.ui.button(
+        label='Previous',
+        row = 0,
+        style = discord.ButtonStyle.gray
+    )
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(
+        label='Next',
+        row = 0,
+        style = discord.ButtonStyle.gray
+    )
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+
+async def current(interaction: discord.Interaction, twow, state):
+    """
+    Canonical state of the TWOW a modal or ephemeral view was opened for, or None (after telling the user) if it has moved on.
+    """
+    canonical = registry.twows.current(twow, state)
+    if canonical is None:
+        await interaction.response.send_message('This TWOW has moved on since this was opened.', ephemeral=True)
+    return canonical
+
+
+async def reply(interaction: discord.Interaction, content: str, **kwargs):
+    """
+    Send a message in response to an interaction, whether or not it has been deferred.
+    """
+    if interaction.response.is_done():
+        await interaction.followup.send(content, **kwargs)
+    else:
+        await interaction.response.send_message(content, **kwargs)
+
+
+async def edit(interaction: discord.Interaction, **kwargs):
+    """
+    Edit the message of a component interaction, whether or not it has been deferred.
+    """
+    if interaction.response.is_done():
+        await interaction.edit_original_response(**kwargs)
+    else:
+        await interaction.response.edit_message(**kwargs)
@@ -0,0 +1,112 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+LEFT, RIGHT = 0, 1  # Vote.side: which option the upvoted response was shown as, None (-1 here) if unknown
+
+BIAS_Z = 4.  # standard scores beyond which a voter's option 1 / option 2 split is considered biased
+AGREEMENT_Z = 3.  # standard score below which a voter disagrees with consensus more than chance would
+MAX_RATE = 20.  # votes per minute a careful voter can sustain
+MIN_RATE_VOTES = 10  # timed votes needed before a voter can be flagged as fast
+TIMESTAMP_RESOLUTION = 1.  # seconds (SQLite CURRENT_TIMESTAMP)
+
+
+class VoterStats(NamedTuple):
+    """
+    Per-voter statistics for one round, as parallel arrays (one entry per voter).
+    """
+    voters: np.ndarray  # user ids, ascending
+    votes: np.ndarray
+    left_fraction: np.ndarray  # fraction of votes (with a known side) for option 1, nan if none
+    rate: np.ndarray  # votes per minute over the voter's active span (an upper bound on the span is used)
+    agreement: np.ndarray  # fraction of votes agreeing with everyone else's consensus (ties and unknowns count half)
+    biased: np.ndarray
+    fast: np.ndarray
+    contrarian: np.ndarray
+
+    @property
+    def trust(self):
+        """
+        Weight of each voter's votes in [0, 1]. Voters who are not flagged keep full weight.
+        """
+        trust = np.ones(len(self.voters))
+        trust[self.biased] *= 1 - np.abs(2 * self.left_fraction[self.biased] - 1)
+        trust[self.fast] *= MAX_RATE / self.rate[self.fast]
+        trust[self.contrarian] *= 2 * self.agreement[self.contrarian]
+        return trust
+
+    def weights(self):
+        return dict(zip(self.voters.tolist(), self.trust.tolist()))
+
+    def flagged(self):
+        """
+        Reasons each flagged voter was flagged for.
+        """
+        reasons = {}
+        for name, mask in [('biased', self.biased), ('fast', self.fast), ('contrarian', self.contrarian)]:
+            for user_id in self.voters[mask].tolist():
+                reasons.setdefault(user_id, []).append(name)
+        return reasons
+
+
+def voter_stats(user_ids, upvoted_ids, downvoted_ids, sides, timestamps):
+    """
+    Statistics for every voter in a single vectorized pass over a round's votes.
+    `sides` uses -1 for votes recorded before sides were, `timestamps` are in seconds (nan if unknown).
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    upvoted_ids = np.asarray(upvoted_ids, dtype=np.int64)
+    downvoted_ids = np.asarray(downvoted_ids, dtype=np.int64)
+    sides = np.asarray(sides, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+
+    voters, voter = np.unique(user_ids, return_inverse=True)
+    n = len(voters)
+    votes = np.bincount(voter, minlength=n)
+
+    # left/right bias, as a binomial standard score against an even split
+    known = np.bincount(voter, weights=sides >= 0, minlength=n)
+    left = np.bincount(voter, weights=sides == LEFT, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        left_fraction = left / known
+        bias_z = (left - known / 2) / np.sqrt(known / 4)
+    biased = np.abs(np.nan_to_num(bias_z)) >= BIAS_Z
+
+    # vote rate over each voter's first to last timed vote, only judged once there are enough of them
+    timed = ~np.isnan(timestamps)
+    timed_votes = np.bincount(voter[timed], minlength=n)
+    first = np.full(n, np.inf)
+    last = np.full(n, -np.inf)
+    np.minimum.at(first, voter[timed], timestamps[timed])
+    np.maximum.at(last, voter[timed], timestamps[timed])
+    span = np.where(timed_votes > 0, last - first, 0.) + TIMESTAMP_RESOLUTION  # timestamps are truncated
+    rate = 60 * np.maximum(timed_votes - 1, 0) / span
+    fast = (timed_votes >= MIN_RATE_VOTES) & (rate > MAX_RATE)
+
+    # consensus win rate per response, with every voter weighing the same in total
+    m = len(user_ids)
+    _, response = np.unique(np.concatenate([upvoted_ids, downvoted_ids]), return_inverse=True)
+    up, down = response[:m], response[m:]
+    weight = 1 / votes[voter]
+    wins = np.bincount(up, weights=weight, minlength=response.max(initial=-1) + 1)
+    seen = wins + np.bincount(down, weights=weight, minlength=len(wins))
+
+    # leave each voter's own votes out of the consensus they are compared with
+    _, own = np.unique(np.concatenate([voter * len(wins) + up, voter * len(wins) + down]), return_inverse=True)
+    own_wins = np.bincount(own[:m], minlength=own.max(initial=-1) + 1)
+    own_seen = own_wins + np.bincount(own[m:], minlength=len(own_wins))
+
+    def others(response, own_key):
+        other_wins = wins[response] - weight * own_wins[own_key]
+        other_seen = seen[response] - weight * own_seen[own_key]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(other_seen > 1e-9, other_wins / other_seen, np.nan)  # nan if nobody else saw it
+
+    up_consensus, down_consensus = others(up, own[:m]), others(down, own[m:])
+    agrees = np.where(up_consensus > down_consensus, 1., np.where(up_consensus < down_consensus, 0., .5))
+    agreed = np.bincount(voter, weights=agrees, minlength=n)
+    agreement = agreed / np.maximum(votes, 1)
+    contrarian = (agreed - votes / 2) / np.sqrt(votes / 4) <= -AGREEMENT_Z
+
+    return VoterStats(voters, votes, left_fraction, rate, agreement, biased, fast, contrarian)